@@ -0,0 +1,76 @@
+"""
+Сравнение пропускной способности сериализации списка настроек:
+SettingItemSerializer + JSONRenderer (DRF) против быстрого пути (dict'ы + JSON_ENCODER).
+
+    python benchmarks/bench_serialization.py [--items 5000] [--repeat 20]
+
+БД не нужна: элементы собираются в памяти в той же форме, что отдаёт _defn_dict.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer
+
+from confetti.payload import json_dumps, orjson_dumps
+from confetti.serializers import SettingItemSerializer
+
+
+def make_items(count: int) -> list[dict]:
+    return [
+        {
+            'key': f'feature.group{i % 50}.flag{i}',
+            'category': f'group{i % 50}',
+            'title': f'Флаг {i}',
+            'type': 'json' if i % 3 else 'bool',
+            'default': {'limit': i, 'tags': ['a', 'b']} if i % 3 else True,
+            'global_value': None if i % 2 else {'limit': i * 2},
+            'user_value': None,
+            'effective': {'limit': i},
+            'frontend': bool(i % 5),
+            'required': False,
+            'editable': True,
+            'choices': [],
+            'enabled': True,
+        }
+        for i in range(count)
+    ]
+
+
+def drf_path(items):
+    return JSONRenderer().render(SettingItemSerializer(items, many=True).data)
+
+
+def bench(name, func, items, repeat):
+    func(items)  # прогрев
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(items)
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f'{name:<24} {elapsed * 1000:9.2f} ms/list  {len(items) / elapsed:12.0f} items/s')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    base = bench('DRF serializer', drf_path, items, args.repeat)
+    for name, func in (('fast: json_dumps', json_dumps), ('fast: orjson_dumps', orjson_dumps)):
+        elapsed = bench(name, func, items, args.repeat)
+        print(f'{"":<24} x{base / elapsed:.1f} относительно DRF')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Пропускная способность записи: set_value (upsert одним запросом) против прежнего
+пути get_or_create + save с инвалидацией через post_save, и set_for_users для когорты.
+
+    python benchmarks/bench_writes.py [--writes 2000] [--cohort 5000]
+
+Поднимает sqlite в памяти и LocMem-кэш, миграции прогоняются на старте.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+settings.configure(
+    SECRET_KEY='bench',
+    INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'confetti'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    DEFAULT_AUTO_FIELD='django.db.models.BigAutoField',
+    CONFETTI={'AUTO_SEED': False},
+)
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from confetti.api import reset_for_users, set_for_users, set_value
+from confetti.models import SettingDefinition, SettingScope, SettingValue
+from confetti.validators import validate_value
+
+
+def legacy_set_value(def_key, value, user=None, scope=None):
+    """Прежняя реализация set_value: до 5 запросов на запись."""
+    defn = SettingDefinition.objects.get(key=def_key)
+    value = validate_value(defn, value)
+    if scope is None:
+        scope = SettingScope.USER if user else SettingScope.GLOBAL
+    sv, _ = SettingValue.objects.get_or_create(
+        definition=defn, scope=scope, user=user if scope == SettingScope.USER else None
+    )
+    sv.value = value
+    sv.save()
+    return sv
+
+
+def bench(name, func, users, writes):
+    with CaptureQueriesContext(connection) as ctx:
+        func('bench.value', 0, user=users[0])
+    started = time.perf_counter()
+    for i in range(writes):
+        func('bench.value', i, user=users[i % len(users)])
+    elapsed = time.perf_counter() - started
+    print(f'{name:<12} {writes / elapsed:10.0f} writes/s  {len(ctx.captured_queries):3d} SQL на запись (с BEGIN/COMMIT)')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--cohort', type=int, default=5000)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    SettingDefinition.objects.create(key='bench.value', type='int', title='Bench', default=0)
+    User = get_user_model()
+    users = [User.objects.create(username=f'user{i}') for i in range(50)]
+
+    legacy = bench('legacy', legacy_set_value, users, args.writes)
+    upsert = bench('upsert', set_value, users, args.writes)
+    print(f'x{legacy / upsert:.1f} быстрее')
+
+    cohort = User.objects.bulk_create([User(username=f'cohort{i}') for i in range(args.cohort)])
+    ids = list(User.objects.filter(username__startswith='cohort').values_list('id', flat=True))
+    started = time.perf_counter()
+    set_for_users('bench.value', dict.fromkeys(ids, 1))
+    written = time.perf_counter() - started
+    started = time.perf_counter()
+    reset_for_users('bench.value', ids)
+    reset = time.perf_counter() - started
+    print(f'set_for_users   {len(cohort) / written:10.0f} writes/s')
+    print(f'reset_for_users {len(cohort) / reset:10.0f} deletes/s')
+
+
+if __name__ == '__main__':
+    main()
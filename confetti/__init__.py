@@ -1 +1,11 @@
 default_app_config = 'confetti.apps.ConfettiConfig'
+
+
+def setting(key: str, type=None, default=None):
+    """
+    Предкомпилированная ссылка на настройку (см. confetti.handles.SettingHandle):
+
+        FEATURE_X = confetti.setting('feature.x', type=int)
+    """
+    from .handles import SettingHandle
+    return SettingHandle(key, type=type, default=default)
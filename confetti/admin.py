@@ -7,7 +7,7 @@ from django.contrib import admin, messages
 from django.db.models import Count, QuerySet
 from django.utils.html import escape, format_html
 
-from .api import _ck  # внутренний хелпер для кэш-ключей
+from .api import _invalidate_definitions  # внутренний хелпер инвалидации
 from .models import (
     SettingCategory,
     SettingDefinition,
@@ -103,21 +103,8 @@ class SettingValueInline(admin.TabularInline):
 
 @admin.action(description="Очистить кэш для выбранных настроек")
 def clear_cache_for_definitions(modeladmin, request, queryset: QuerySet[SettingDefinition]):
-    from django.core.cache import cache
-    from .models import SettingScope, SettingValue
-
-    cleared = 0
-    for d in queryset:
-        # глобальный
-        if cache.delete(_ck(d.key, None)):
-            cleared += 1
-        # пользовательские
-        user_ids = SettingValue.objects.filter(
-            definition=d, scope=SettingScope.USER
-        ).values_list("user_id", flat=True)
-        for uid in user_ids:
-            if cache.delete(_ck(d.key, uid)):
-                cleared += 1
+    # поколения поднимаются одним set_many, старые ключи (в т.ч. всех оверрайдов) удаляются пачками
+    cleared = _invalidate_definitions(queryset.only("id", "key", "frontend"), purge_keys=True)
 
     modeladmin.message_user(
         request,
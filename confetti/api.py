@@ -1,68 +1,836 @@
-from django.core.cache import cache
+import enum
+import itertools
+import json
+import math
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Iterable
 
-from .models import SettingDefinition, SettingValue, SettingScope
+from asgiref.sync import sync_to_async
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import SettingChangeAction, SettingDefinition, SettingValue, SettingScope
 from .validators import validate_value
 from .conf import confetti_settings
+from .registry import registry
+from .versions import (REGISTRY_VERSION_KEY, _user_version_key, bump_registry_version, bump_user_version,
+                       bump_user_versions)
+from .changes import make_change, publish_changes
+from .invalidation import apending_invalidations, pending_invalidations
 
 CACHE_PREFIX = confetti_settings.CACHE_PREFIX
 CACHE_PREFIX_ENABLED = 'is_enabled'
 
-def _ck(def_key, user_id=None):
-    return f'{CACHE_PREFIX}:{def_key}:{user_id or "global"}'
+_MISS = object()
 
-def _is_enabled_ck(def_key, user_id=None):
-    return f'{CACHE_PREFIX_ENABLED}:{def_key}:{user_id}:enabled'
+# Контекст настроек текущего запроса, выставляется ConfettiMiddleware
+request_settings: ContextVar = ContextVar('confetti_request_settings', default=None)
 
-def get(def_key: str, user=None, default=None):
+
+class CacheMarker(enum.Enum):
     """
-    Приоритет: user override -> global -> definition.default -> default (параметр).
-    Результат кэшируется.
+    Служебные значения в кэше, чтобы отличать «значения нет» от None.
+    Enum переживает pickle с сохранением identity.
     """
-    uid = getattr(user, 'id', None)
-    for key in (_ck(def_key, uid), _ck(def_key, None)):
-        cached = cache.get(key)
-        if cached is not None and (uid or key.endswith(':global')):
-            return cached
+    MISSING = 'missing'          # определения нет или оно выключено
+    NO_VALUE = 'no_value'        # ни значения, ни definition.default — берём default вызова
+    NO_OVERRIDE = 'no_override'  # у пользователя нет своего значения
+
+
+_IMMUTABLE = (str, bytes, int, float, bool, type(None), CacheMarker)
+
+
+class _Pickled(bytes):
+    """Изменяемое значение (dict/list из JSON), сохранённое в процессном уровне сериализованным."""
+
+
+def _freeze(value):
+    """
+    Значение для хранения в памяти процесса. django cache сериализует значения, и каждый
+    вызывающий получает свою копию; процессные уровни хранят изменяемые значения так же.
+    """
+    return value if isinstance(value, _IMMUTABLE) else _Pickled(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _thaw(value):
+    return pickle.loads(value) if type(value) is _Pickled else value
+
+
+class LocalCache:
+    """
+    Процессный L1-кэш (LRU + TTL) перед django cache.
+    Включается через CONFETTI['LOCAL_CACHE'], размер и время жизни записей
+    берутся из LOCAL_CACHE_MAXSIZE / LOCAL_CACHE_TIMEOUT.
+    Изменяемые значения хранятся сериализованными (_freeze): изменение полученного
+    значения вызывающим не затрагивает кэш.
+    """
+
+    def __init__(self):
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default=_MISS):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+        return _thaw(value)
+
+    def set(self, key: str, value) -> None:
+        expires = time.monotonic() + confetti_settings.LOCAL_CACHE_TIMEOUT
+        maxsize = confetti_settings.LOCAL_CACHE_MAXSIZE
+        value = _freeze(value)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+
+local_cache = LocalCache()
+
+
+def _cache_get(key: str):
+    """Чтение через L1 (если включен), затем из django cache."""
+    use_local = confetti_settings.LOCAL_CACHE
+    if use_local:
+        value = local_cache.get(key)
+        if value is not _MISS:
+            return value
+    value = cache.get(key)
+    if use_local and value is not None:
+        local_cache.set(key, value)
+    return value
+
+
+_MISSING_ENTRY = (CacheMarker.MISSING, CacheMarker.MISSING)
+
+def _registry_entry(def_key: str) -> tuple[Any, Any] | None:
+    """Записи (get, is_enabled) из снимка реестра, если включен REGISTRY_SNAPSHOT."""
+    if not confetti_settings.REGISTRY_SNAPSHOT:
+        return None
+    _poll_local_caches()
+    get_entry, enabled_entry = registry.entries().get(def_key, _MISSING_ENTRY)
+    return _thaw(get_entry), enabled_entry
+
+
+def _local_lookup(keys: list[str]) -> tuple[dict[str, Any], list[str]]:
+    """Часть ключей, найденная в L1, и список оставшихся для django cache."""
+    if not confetti_settings.LOCAL_CACHE:
+        return {}, keys
+    found: dict[str, Any] = {}
+    for key in keys:
+        value = local_cache.get(key)
+        if value is not _MISS:
+            found[key] = value
+    return found, [key for key in keys if key not in found]
+
+
+def _cache_set(key: str, value) -> None:
+    cache.set(key, value)
+    if confetti_settings.LOCAL_CACHE:
+        local_cache.set(key, value)
+
+
+def _cache_get_many(keys: list[str]) -> dict[str, Any]:
+    found, keys = _local_lookup(keys)
+    if keys:
+        found.update(_remember_locally(cache.get_many(keys)))
+    return found
+
+
+def _cache_set_many(mapping: dict[str, Any]) -> None:
+    if not mapping:
+        return
+    cache.set_many(mapping)
+    if confetti_settings.LOCAL_CACHE:
+        for key, value in mapping.items():
+            local_cache.set(key, value)
+
+
+def _gen_key(def_key=None):
+    return f'{CACHE_PREFIX}:gen:{def_key}' if def_key else f'{CACHE_PREFIX}:gen'
+
+def _generations(def_keys: Iterable[str]) -> dict[str, str]:
+    """
+    Поколения кэша для ключей настроек: «<поколение реестра>.<поколение definition>».
+    Все счётчики читаются одним cache.get_many; потерянный счётчик заводится заново
+    от time.time_ns(), чтобы не воскресить старые ключи.
+    """
+    _poll_local_caches()
+    return _read_generations({k: _gen_key(k) for k in def_keys})
+
+def _read_generations(gen_keys: dict[str, str]) -> dict[str, str]:
+    wanted = [_gen_key(), *gen_keys.values()]
+    found = _cache_get_many(wanted)
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        initial = time.time_ns()
+        for key in missing:
+            cache.add(key, initial, None)
+        # перечитываем: параллельный процесс мог успеть завести счётчик первым
+        found.update(_remember_locally(cache.get_many(missing)))
+    return _format_generations(found, gen_keys)
+
+def _remember_locally(values: dict[str, Any]) -> dict[str, Any]:
+    if confetti_settings.LOCAL_CACHE:
+        for key, value in values.items():
+            local_cache.set(key, value)
+    return values
+
+def _format_generations(found: dict[str, Any], gen_keys: dict[str, str]) -> dict[str, str]:
+    registry_gen = found.get(_gen_key())
+    return {k: f'{registry_gen}.{found.get(gen_key)}' for k, gen_key in gen_keys.items()}
+
+def _bump_generation(def_key=None) -> None:
+    """Инвалидирует все ключи definition (или всего реестра при def_key=None) одним инкрементом."""
+    key = _gen_key(def_key)
+    local_cache.delete(key)
     try:
-        defn = SettingDefinition.objects.get(key=def_key, enabled=True)
-    except SettingDefinition.DoesNotExist:
-        return default
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+def _bump_generations(def_keys: Iterable[str]) -> None:
+    """
+    Поднимает поколения нескольких definition одним cache.set_many.
+    Новое значение — текущее time_ns: оно заведомо больше старого счётчика
+    (тот стартовал с более раннего time_ns и растёт на единицы).
+    """
+    stamp = time.time_ns()
+    gen_keys = [_gen_key(k) for k in def_keys]
+    for key in gen_keys:
+        local_cache.delete(key)
+    cache.set_many({key: stamp for key in gen_keys}, None)
+
+def bump_registry_generation() -> None:
+    """Сбрасывает кэш значений всех настроек разом."""
+    _bump_generation(None)
 
-    # user override
+def _ck(def_key, user_id=None, gen=None):
+    gen = gen or _generations([def_key])[def_key]
+    return f'{CACHE_PREFIX}:{def_key}:{gen}:{user_id or "global"}'
+
+def _is_enabled_ck(def_key, user_id=None, gen=None):
+    gen = gen or _generations([def_key])[def_key]
+    return f'{CACHE_PREFIX_ENABLED}:{def_key}:{gen}:{user_id}:enabled'
+
+def with_values(qs, uid=None):
+    """
+    Аннотирует queryset SettingDefinition глобальным значением (`_global_value`)
+    и, если передан uid, override пользователя (`_user_value`) — коррелированные
+    подзапросы, всё остаётся одним SQL-запросом.
+    """
+    values = SettingValue.objects.filter(definition=OuterRef('pk')).values('value')
+    qs = qs.annotate(
+        _global_value=Subquery(values.filter(scope=SettingScope.GLOBAL, user__isnull=True)[:1]),
+    )
     if uid:
-        sv = SettingValue.objects.filter(definition=defn, scope=SettingScope.USER, user_id=uid).first()
+        qs = qs.annotate(_user_value=Subquery(values.filter(scope=SettingScope.USER, user_id=uid)[:1]))
+    return qs
+
+def _definitions_queryset(def_keys: Iterable[str] | None, uid=None):
+    """Определения для разрешения значений (def_keys=None — весь реестр)."""
+    qs = SettingDefinition.objects.only('key', 'enabled', 'default')
+    if def_keys is not None:
+        qs = qs.filter(key__in=def_keys)
+    return with_values(qs, uid)
+
+def _fetch_definitions(def_keys: Iterable[str] | None, uid=None) -> dict[str, SettingDefinition]:
+    return {defn.key: defn for defn in _definitions_queryset(def_keys, uid)}
+
+def _global_entry(defn: SettingDefinition | None):
+    """Что хранится под глобальным ключом _ck для get()."""
+    if defn is None or not defn.enabled:
+        return CacheMarker.MISSING
+    if defn._global_value is not None:
+        return defn._global_value
+    return defn.default if defn.default is not None else CacheMarker.NO_VALUE
+
+def _user_entry(defn: SettingDefinition):
+    """Что хранится под пользовательским ключом _ck для get()."""
+    user_value = getattr(defn, '_user_value', None)
+    return user_value if user_value is not None else CacheMarker.NO_OVERRIDE
+
+def _is_enabled_entry(defn: SettingDefinition | None):
+    """Что хранится под ключом _is_enabled_ck."""
+    if defn is None:
+        return CacheMarker.MISSING
+    if not defn.enabled:
+        return False
+    user_value = getattr(defn, '_user_value', None)
+    if user_value is not None:
+        return bool(user_value)
+    if defn._global_value is not None:
+        return bool(defn._global_value)
+    return bool(defn.default) if defn.default is not None else CacheMarker.NO_VALUE
+
+def _get_keys(def_key: str, uid, gen: str) -> tuple[str | None, str]:
+    """Пара ключей get(): пользовательский (None без пользователя) и глобальный."""
+    return (_ck(def_key, uid, gen) if uid else None), _ck(def_key, None, gen)
+
+def _resolve_get(defn: SettingDefinition | None, keys: tuple[str | None, str], default, to_cache: dict[str, Any]):
+    """
+    Разрешает значение для get() по definition из _fetch_definitions
+    и дописывает в to_cache записи для глобального и пользовательского ключей.
+    """
+    return _unwrap(_resolve_entry(defn, keys, to_cache), default)
+
+def _resolve_entry(defn: SettingDefinition | None, keys: tuple[str | None, str], to_cache: dict[str, Any]):
+    """_resolve_get без подстановки default: override, глобальная запись или CacheMarker."""
+    user_key, global_key = keys
+    entry = _global_entry(defn)
+    to_cache[global_key] = entry
+    if user_key and entry is not CacheMarker.MISSING:
+        user_entry = _user_entry(defn)
+        to_cache[user_key] = user_entry
+        if user_entry is not CacheMarker.NO_OVERRIDE:
+            return user_entry
+    return entry
+
+def _from_cache(cached: dict[str, Any], keys: tuple[str | None, str], default):
+    """Пытается ответить get() по прочитанным из кэша ключам; иначе _MISS."""
+    entry = _entry_from_cache(cached, keys)
+    return entry if entry is _MISS else _unwrap(entry, default)
 
-        if sv and sv.value is not None:
-            cache.set(_ck(def_key, uid), sv.value)
-            return sv.value
+def _entry_from_cache(cached: dict[str, Any], keys: tuple[str | None, str]):
+    user_key, global_key = keys
+    user_cached = cached.get(user_key) if user_key else CacheMarker.NO_OVERRIDE
+    if user_cached is not None and user_cached is not CacheMarker.NO_OVERRIDE:
+        return user_cached
+    global_cached = cached.get(global_key)
+    if global_cached is CacheMarker.MISSING or (
+            user_cached is CacheMarker.NO_OVERRIDE and global_cached is not None):
+        return global_cached
+    return _MISS
 
-    # global
-    gv = SettingValue.objects.filter(definition=defn, scope=SettingScope.GLOBAL, user__isnull=True).first()
-    if gv and gv.value is not None:
-        cache.set(_ck(def_key, None), gv.value)
-        return gv.value
-    return defn.default if defn.default is not None else default
+def _unwrap(cached, default):
+    """Превращает закэшированный маркер в значение для вызывающего."""
+    if cached is CacheMarker.MISSING or cached is CacheMarker.NO_VALUE:
+        return default
+    return cached
+
+def _unwrap_enabled(cached, default):
+    if cached is CacheMarker.MISSING:
+        return default
+    if cached is CacheMarker.NO_VALUE:
+        return bool(default)
+    return cached
+
+# Полосатые блокировки single-flight: ограниченное число, без роста по ключам
+_FLIGHT_LOCKS = [threading.Lock() for _ in range(64)]
+
+def _single_flight(lock_key: str, read_cached, compute):
+    """
+    Защита от «набега» на холодный ключ (CONFETTI['SINGLE_FLIGHT']).
+    В процессе ключ пересчитывает один поток, остальные ждут его до SINGLE_FLIGHT_TIMEOUT
+    и читают результат из кэша. С SINGLE_FLIGHT_LEASE между процессами дополнительно
+    берётся аренда через cache.add: остальные воркеры ждут появления значения в кэше.
+    Не дождались — считают сами, чтобы не зависнуть на упавшем владельце.
+    Аренда живёт SINGLE_FLIGHT_LEASE_TTL целых секунд, независимо от времени ожидания.
+    """
+    if not confetti_settings.SINGLE_FLIGHT:
+        return compute()
+    timeout = confetti_settings.SINGLE_FLIGHT_TIMEOUT
+    lock = _FLIGHT_LOCKS[hash(lock_key) % len(_FLIGHT_LOCKS)]
+    if not lock.acquire(timeout=timeout):
+        return compute()
+    try:
+        hit = read_cached()
+        if hit is not _MISS:
+            return hit
+        if not confetti_settings.SINGLE_FLIGHT_LEASE:
+            return compute()
+        lease_key = f'{lock_key}:lease'
+        if cache.add(lease_key, 1, _lease_ttl()):
+            try:
+                return compute()
+            finally:
+                cache.delete(lease_key)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(min(0.02, timeout))
+            hit = read_cached()
+            if hit is not _MISS:
+                return hit
+        return compute()
+    finally:
+        lock.release()
+
+def _lease_ttl() -> int:
+    # Redis/Memcached принимают TTL в целых секундах: 0.5 превратился бы в «истекает сразу»
+    return max(1, math.ceil(confetti_settings.SINGLE_FLIGHT_LEASE_TTL))
+
+def _load_get(def_key: str, uid, keys: tuple[str | None, str], default):
+    """Промах get(): definition, override и глобальное значение одним запросом под single-flight."""
+    return _unwrap(_load_get_entry(def_key, uid, keys), default)
+
+def _load_get_entry(def_key: str, uid, keys: tuple[str | None, str]):
+    """_load_get без подстановки default: значение или CacheMarker."""
+    def read_cached():
+        return _entry_from_cache(_cache_get_many([key for key in keys if key]), keys)
+
+    def compute():
+        defn = _fetch_definitions([def_key], uid).get(def_key)
+        to_cache: dict[str, Any] = {}
+        entry = _resolve_entry(defn, keys, to_cache)
+        _cache_set_many(to_cache)
+        return entry
+
+    return _single_flight(keys[0] or keys[1], read_cached, compute)
+
+def _load_is_enabled(flag_key: str, uid, cache_key: str, default):
+    """Промах is_enabled(): один запрос под single-flight."""
+    return _unwrap_enabled(_load_is_enabled_entry(flag_key, uid, cache_key), default)
+
+def _load_is_enabled_entry(flag_key: str, uid, cache_key: str):
+    """_load_is_enabled без подстановки default: bool или CacheMarker."""
+    def read_cached():
+        cached = _cache_get_many([cache_key]).get(cache_key)
+        return _MISS if cached is None else cached
+
+    def compute():
+        entry = _is_enabled_entry(_fetch_definitions([flag_key], uid).get(flag_key))
+        _cache_set(cache_key, entry)
+        return entry
+
+    return _single_flight(cache_key, read_cached, compute)
+
+def get(def_key: str, user=None, default=None):
+    """
+    Приоритет: user override -> global -> definition.default -> default (параметр).
+    Результат кэшируется, включая «значения нет» и «настройки нет» (через CacheMarker).
+    """
+    uid = getattr(user, 'id', None)
+    if not uid and (entry := _registry_entry(def_key)) is not None:
+        return _unwrap(entry[0], default)
+    ctx = request_settings.get()
+    if ctx is not None and ctx.serves(uid):
+        return ctx.get(def_key, default, for_user=bool(uid))
+    keys = _get_keys(def_key, uid, _generations([def_key])[def_key])
+    cached = _cache_get_many([key for key in keys if key])
+    hit = _from_cache(cached, keys, default)
+    if hit is not _MISS:
+        return hit
+    return _load_get(def_key, uid, keys, default)
 
 def set_value(def_key: str, value, user=None, scope=None):
     """
     Устанавливает значение с валидацией по типу.
     scope: None => USER если user передан, иначе GLOBAL.
+    Запись — один upsert, инвалидация — по уже загруженному definition, без post_save,
+    после коммита транзакции.
     """
     defn = SettingDefinition.objects.get(key=def_key)
 
     value = validate_value(defn, value)
     if scope is None:
         scope = SettingScope.USER if user else SettingScope.GLOBAL
-
-    sv, _ = SettingValue.objects.get_or_create(
-        definition=defn, scope=scope, user=user if scope == SettingScope.USER else None
-    )
     if not defn.editable:
         value = defn.default
-    sv.value = value
-    sv.save()
-    cache.set(_ck(def_key, sv.user_id if sv.scope == SettingScope.USER else None), value)
-    return sv
+    uid = getattr(user, 'id', user) if scope == SettingScope.USER else None
+
+    return _write_values([defn], [value], scope, uid)[0]
+
+def _write_values(definitions: list[SettingDefinition], values: list, scope, uid=None) -> list[SettingValue]:
+    """
+    Значения одного scope: upsert и журнал изменений одной транзакцией,
+    после коммита — один проход инвалидации. Сигналы post_save не участвуют.
+    """
+    rows = [
+        SettingValue(definition=defn, scope=scope, user_id=uid, value=value)
+        for defn, value in zip(definitions, values)
+    ]
+    with transaction.atomic():
+        _upsert_values(rows, scope)
+        # bulk_create/update() не шлют сигналы — публикуем изменения сами, в той же транзакции
+        publish_changes(make_change(defn.key, scope, uid, visible=defn.editable) for defn in definitions)
+        # внутри внешней транзакции — только после её коммита
+        transaction.on_commit(lambda: _after_write(definitions, scope, uid))
+    _reset_request_settings()
+    return rows
+
+def _after_write(definitions: list[SettingDefinition], scope, uid=None) -> None:
+    """
+    Вызывается после коммита записи (transaction.on_commit): удалять ключи раньше
+    нельзя — конкурентное чтение успело бы положить в кэш старое закоммиченное значение.
+    С CACHE_WRITE_THROUGH кэш сразу заполняется перечитанными из БД значениями.
+    """
+    _invalidate_values(definitions, scope, uid)
+    if confetti_settings.CACHE_WRITE_THROUGH:
+        _write_through([defn.key for defn in definitions], scope, uid)
+
+def _write_through(def_keys: list[str], scope, uid=None) -> None:
+    """
+    Записи get() по значениям, перечитанным после коммита, а не по записанным:
+    колбэки двух писателей могут выполниться не в порядке коммитов, и в кэш
+    попало бы более старое значение. Поколения читаются до БД — если пока мы
+    читаем, поколение поднимут снова, запись уйдёт в уже недостижимый ключ.
+    """
+    gens = _generations(def_keys)
+    uid = uid if scope == SettingScope.USER else None
+    definitions = _fetch_definitions(def_keys, uid)
+    to_cache: dict[str, Any] = {}
+    for def_key in def_keys:
+        defn = definitions.get(def_key)
+        if uid is None:
+            to_cache[_ck(def_key, None, gens[def_key])] = _global_entry(defn)
+        # у выключенной настройки пользовательский ключ не хранится (см. _resolve_get)
+        elif defn is not None and defn.enabled:
+            to_cache[_ck(def_key, uid, gens[def_key])] = _user_entry(defn)
+    _cache_set_many(to_cache)
+
+def _invalidate_values(definitions: list[SettingDefinition], scope, uid=None) -> None:
+    """
+    Один проход инвалидации после записи значений (bulk_* не шлют сигналы):
+    пользовательские ключи удаляются пачкой delete_many, глобальные —
+    подъёмом поколений; версии реестра/пользователя поднимаются один раз.
+    """
+    if not definitions:
+        return
+    def_keys = [defn.key for defn in definitions]
+    if scope == SettingScope.USER:
+        gens = _generations(def_keys)
+        _delete_keys(
+            key
+            for def_key in def_keys
+            for key in (_ck(def_key, uid, gens[def_key]), _is_enabled_ck(def_key, uid, gens[def_key]))
+        )
+        bump_user_version(uid)
+    else:
+        # frontend-тело сбрасывается до подъёма версии: увидевший новую версию не прочтёт старое тело
+        if any(defn.frontend for defn in definitions):
+            cache.delete(confetti_settings.FRONTEND_CACHE_PREFIX)
+        _bump_generations(def_keys)
+        bump_registry_version()
+        registry.invalidate()
+
+def _invalidate_definitions(definitions: Iterable[SettingDefinition], purge_keys: bool = False) -> int:
+    """
+    Инвалидация после изменения определений: поколения поднимаются одним set_many,
+    версия реестра — один раз, frontend-список сбрасывается.
+    purge_keys=True дополнительно удаляет уже недостижимые ключи старого поколения
+    (глобальные и оверрайдов) — освобождает память кэша. Возвращает число удалённых ключей.
+    """
+    definitions = list(definitions)
+    if not definitions:
+        return 0
+    def_keys = [defn.key for defn in definitions]
+    gens = _generations(def_keys) if purge_keys else None
+    # frontend-тело — до подъёма версии (см. _invalidate_values)
+    cache.delete(confetti_settings.FRONTEND_CACHE_PREFIX)
+    _bump_generations(def_keys)
+    bump_registry_version()
+    registry.invalidate()
+    if gens is None:
+        return 1
+    return 1 + _delete_keys(_definition_keys(definitions, gens))
+
+def _definition_keys(definitions: list[SettingDefinition], gens: dict[str, str]) -> Iterable[str]:
+    """
+    Ключи значений и is_enabled поколения gens: глобальные и всех оверрайдов.
+    Пользователи читаются потоком (.iterator()), память не растёт с числом оверрайдов.
+    """
+    for defn in definitions:
+        yield _ck(defn.key, None, gens[defn.key])
+        yield _is_enabled_ck(defn.key, None, gens[defn.key])
+    overrides = (
+        SettingValue.objects
+        .filter(definition__in=[defn.pk for defn in definitions], scope=SettingScope.USER)
+        .values_list('definition__key', 'user_id')
+        .iterator(chunk_size=confetti_settings.INVALIDATION_CHUNK_SIZE)
+    )
+    for def_key, uid in overrides:
+        yield _ck(def_key, uid, gens[def_key])
+        yield _is_enabled_ck(def_key, uid, gens[def_key])
+
+def _delete_keys(keys: Iterable[str]) -> int:
+    """
+    Удаляет ключи из обоих уровней пачками cache.delete_many по INVALIDATION_CHUNK_SIZE.
+    Возвращает число отправленных на удаление ключей.
+    """
+    chunk_size = confetti_settings.INVALIDATION_CHUNK_SIZE
+    keys = iter(keys)
+    deleted = 0
+    while chunk := list(itertools.islice(keys, chunk_size)):
+        for key in chunk:
+            local_cache.delete(key)
+        cache.delete_many(chunk)
+        deleted += len(chunk)
+    return deleted
+
+def _poll_local_caches() -> None:
+    """Забирает изменения из шины инвалидации (INVALIDATION_BUS), если подошло время опроса."""
+    _drop_local(pending_invalidations())
+
+async def _apoll_local_caches() -> None:
+    _drop_local(await apending_invalidations())
+
+def _cache_is_local() -> bool:
+    """django cache живёт в памяти процесса — его тоже чистим по шине."""
+    return isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+def _drop_local(changes: list[dict[str, Any]] | None) -> None:
+    """
+    Сбрасывает процессные уровни по изменениям из других воркеров:
+    L1, снимок реестра и django cache, если он процессный (LocMemCache).
+    Глобальные изменения и изменения definition — поколение definition, версия
+    реестра, frontend-список; пользовательские — ключи и версия пользователя.
+    changes=None — изменения потеряны: сбрасывается поколение всего реестра.
+    """
+    if changes is not None and not changes:
+        return
+    registry.invalidate()
+    if changes is None:
+        local_cache.clear()
+        stale = [confetti_settings.FRONTEND_CACHE_PREFIX, _gen_key(), REGISTRY_VERSION_KEY]
+    else:
+        stale = []
+        overrides = []
+        for change in changes:
+            if change['scope'] == SettingScope.USER:
+                overrides.append((change['key'], change['user_id']))
+            else:
+                stale.append(_gen_key(change['key']))
+        if len(stale) < len(changes):
+            stale = [confetti_settings.FRONTEND_CACHE_PREFIX, *stale, REGISTRY_VERSION_KEY]
+        # поколения перечитываются после сброса глобальных: ключи пользователей — в актуальном
+        _forget(stale)
+        if not overrides:
+            return
+        gens = _read_generations({def_key: _gen_key(def_key) for def_key, _ in overrides})
+        stale = [
+            key
+            for def_key, uid in overrides
+            for key in (_ck(def_key, uid, gens[def_key]), _is_enabled_ck(def_key, uid, gens[def_key]),
+                        _user_version_key(uid))
+        ]
+    _forget(stale)
+
+def _forget(keys: list[str]) -> None:
+    if _cache_is_local():
+        _delete_keys(keys)
+    else:
+        for key in keys:
+            local_cache.delete(key)
+
+def _upsert_values(rows: list[SettingValue], scope) -> None:
+    """
+    Вставка-или-обновление пачки значений одного scope.
+    USER — INSERT .. ON CONFLICT по unique_setting_value; у GLOBAL user = NULL,
+    NULL в уникальном индексе не конфликтует — поэтому UPDATE, а при промахе INSERT
+    (для пачки — bulk_update + bulk_create).
+    Строки rows после вызова соответствуют сохранённым: pk заполнен, _state.adding=False.
+    """
+    if scope == SettingScope.USER and connection.features.supports_update_conflicts_with_target:
+        SettingValue.objects.bulk_create(
+            rows, update_conflicts=True,
+            unique_fields=['definition', 'scope', 'user'], update_fields=['value'],
+        )
+        return
+    if len(rows) == 1:
+        row = rows[0]
+        stored = SettingValue.objects.filter(definition_id=row.definition_id, scope=scope, user_id=row.user_id)
+        if not stored.update(value=row.value):
+            SettingValue.objects.bulk_create(rows)
+            return
+        _mark_stored(row, stored.values_list('pk', flat=True).first())
+        return
+    owners = (
+        {'user_id__in': {row.user_id for row in rows}} if scope == SettingScope.USER else {'user__isnull': True}
+    )
+    existing = {
+        (sv.definition_id, sv.user_id): sv
+        for sv in SettingValue.objects.filter(
+            definition__in={row.definition_id for row in rows}, scope=scope, **owners,
+        ).only('id', 'definition_id', 'user_id')
+    }
+    to_update = []
+    to_create = []
+    for row in rows:
+        sv = existing.get((row.definition_id, row.user_id))
+        if sv is None:
+            to_create.append(row)
+        else:
+            sv.value = row.value
+            to_update.append(sv)
+            _mark_stored(row, sv.pk)
+    SettingValue.objects.bulk_update(to_update, ['value'])
+    SettingValue.objects.bulk_create(to_create)
+
+def _mark_stored(row: SettingValue, pk) -> None:
+    """Обновлённая через UPDATE строка: иначе save() на результате вставил бы дубликат."""
+    row.pk = pk
+    row._state.adding = False
+    row._state.db = SettingValue.objects.db
+
+def set_many(values: dict[str, Any], user=None, scope=None) -> tuple[dict[str, Any], dict[str, str]]:
+    """
+    Пакетный set_value: {key: value} для одного пользователя или глобально.
+    Все значения проходят validate_value, корректные пишутся одной транзакцией,
+    кэш инвалидируется одним проходом.
+    Возвращает (записанные {key: value}, ошибки {key: сообщение}).
+    """
+    if scope is None:
+        scope = SettingScope.USER if user else SettingScope.GLOBAL
+    uid = getattr(user, 'id', user) if scope == SettingScope.USER else None
+
+    definitions = SettingDefinition.objects.in_bulk(list(values), field_name='key')
+    written: dict[str, Any] = {}
+    errors: dict[str, str] = {}
+    for def_key, value in values.items():
+        defn = definitions.get(def_key)
+        if defn is None:
+            errors[def_key] = 'Настройка не найдена'
+            continue
+        try:
+            value = validate_value(defn, value)
+        except (TypeError, ValueError) as e:
+            errors[def_key] = str(e)
+            continue
+        written[def_key] = value if defn.editable else defn.default
+
+    if written:
+        _write_values([definitions[def_key] for def_key in written], list(written.values()), scope, uid)
+    return written, errors
+
+def set_for_users(def_key: str, values: dict[Any, Any]) -> tuple[dict[Any, Any], dict[Any, str]]:
+    """
+    Пакетные override одной настройки для многих пользователей: {user_id: value}.
+    validate_value вызывается один раз на каждое различное значение; запись — пачками
+    по BULK_WRITE_CHUNK_SIZE (upsert и журнал одной транзакцией на пачку), кэш
+    пачки инвалидируется после её коммита через delete_many.
+    Возвращает (записанные {user_id: value}, ошибки {user_id: сообщение}).
+    """
+    defn = SettingDefinition.objects.get(key=def_key)
+    validated: dict[str, tuple[Any, str | None]] = {}
+    written: dict[Any, Any] = {}
+    errors: dict[Any, str] = {}
+    for uid, value in values.items():
+        token = json.dumps(value, sort_keys=True, default=repr)
+        if token not in validated:
+            try:
+                validated[token] = (validate_value(defn, value) if defn.editable else defn.default, None)
+            except (TypeError, ValueError) as e:
+                validated[token] = (None, str(e))
+        value, error = validated[token]
+        if error is None:
+            written[uid] = value
+        else:
+            errors[uid] = error
+
+    for chunk in _chunks(written.items()):
+        rows = [
+            SettingValue(definition=defn, scope=SettingScope.USER, user_id=uid, value=value)
+            for uid, value in chunk
+        ]
+        with transaction.atomic():
+            _upsert_values(rows, SettingScope.USER)
+            publish_changes(make_change(def_key, SettingScope.USER, uid, visible=defn.editable) for uid, _ in chunk)
+            transaction.on_commit(lambda chunk=chunk: _after_users_write(defn, [uid for uid, _ in chunk]))
+    _reset_request_settings()
+    return written, errors
+
+def reset_for_users(def_key: str, user_ids: Iterable[Any]) -> int:
+    """
+    Удаляет override настройки у пользователей user_ids — пачками по BULK_WRITE_CHUNK_SIZE,
+    без post_delete на каждую строку. Возвращает число удалённых override.
+    """
+    defn = SettingDefinition.objects.get(key=def_key)
+    deleted = 0
+    for chunk in _chunks(dict.fromkeys(user_ids)):
+        with transaction.atomic():
+            found = dict(
+                SettingValue.objects.filter(definition=defn, scope=SettingScope.USER, user_id__in=chunk)
+                .values_list('pk', 'user_id')
+            )
+            if not found:
+                continue
+            deleted += _delete_rows(list(found))
+            uids = list(found.values())
+            publish_changes(
+                make_change(def_key, SettingScope.USER, uid, SettingChangeAction.DELETE, defn.editable) for uid in uids
+            )
+            transaction.on_commit(lambda uids=uids: _after_users_write(defn, uids))
+    _reset_request_settings()
+    return deleted
+
+def _delete_rows(pks: list) -> int:
+    """
+    DELETE строк SettingValue по pk одним запросом, без post_delete: QuerySet.delete()
+    при подключённом purge_value_cache загружает и сигналит каждую строку. Журнал
+    и инвалидация — на стороне вызывающего, пачкой.
+    """
+    ops = connection.ops
+    table = ops.quote_name(SettingValue._meta.db_table)
+    pk_column = ops.quote_name(SettingValue._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {pk_column} IN ({", ".join(["%s"] * len(pks))})', pks)
+        return cursor.rowcount
+
+def _reset_request_settings() -> None:
+    """Контекст настроек текущего запроса (request.confetti) перечитает значения."""
+    ctx = request_settings.get()
+    if ctx is not None:
+        ctx.reset()
+
+def _chunks(items: Iterable) -> Iterable[list]:
+    items = iter(items)
+    while chunk := list(itertools.islice(items, confetti_settings.BULK_WRITE_CHUNK_SIZE)):
+        yield chunk
+
+def _after_users_write(defn: SettingDefinition, uids: list) -> None:
+    """
+    _after_write для пачки пользователей одной настройки.
+    Ключи удаляются delete_many, версии — одним set_many; write-through —
+    по перечитанным после коммита override (один запрос на пачку).
+    """
+    gen = _generations([defn.key])[defn.key]
+    _delete_keys(key for uid in uids for key in (_ck(defn.key, uid, gen), _is_enabled_ck(defn.key, uid, gen)))
+    bump_user_versions(uids)
+    if not confetti_settings.CACHE_WRITE_THROUGH:
+        return
+    current = _fetch_definitions([defn.key]).get(defn.key)
+    if current is None or not current.enabled:
+        return
+    overrides = dict(
+        SettingValue.objects.filter(definition=current, scope=SettingScope.USER, user_id__in=uids)
+        .values_list('user_id', 'value')
+    )
+    _cache_set_many({
+        _ck(defn.key, uid, gen): overrides[uid] if overrides.get(uid) is not None else CacheMarker.NO_OVERRIDE
+        for uid in uids
+    })
 
 def is_enabled(flag_key: str, user=None, default=False) -> bool:
     """
@@ -72,42 +840,159 @@ def is_enabled(flag_key: str, user=None, default=False) -> bool:
     Результат кэшируется отдельно.
     """
     uid = getattr(user, 'id', None)
+    if not uid and (entry := _registry_entry(flag_key)) is not None:
+        return _unwrap_enabled(entry[1], default)
+    ctx = request_settings.get()
+    if ctx is not None and ctx.serves(uid):
+        return ctx.is_enabled(flag_key, default, for_user=bool(uid))
     cache_key = _is_enabled_ck(flag_key, uid)
-    cached = cache.get(cache_key)
+    cached = _cache_get(cache_key)
     if cached is not None:
-        return cached
+        return _unwrap_enabled(cached, default)
+    return _load_is_enabled(flag_key, uid, cache_key, default)
 
-    try:
-        defn = SettingDefinition.objects.get(key=flag_key)
-    except SettingDefinition.DoesNotExist:
-        cache.set(cache_key, default)
-        return default
+def get_many(def_keys: Iterable[str], user=None, default=None) -> dict[str, Any]:
+    """
+    Пакетный get(): один cache.get_many, один SQL-запрос на все промахи
+    и один cache.set_many. Возвращает {ключ: значение}.
+    """
+    return {k: _unwrap(entry, default) for k, entry in _get_entries(def_keys, getattr(user, 'id', None)).items()}
 
-    # Если настройка выключена на уровне definition.enabled — она выключена для всех
-    if not defn.enabled:
-        cache.set(cache_key, False)
-        return False
+def _get_entries(def_keys: Iterable[str], uid=None) -> dict[str, Any]:
+    """Записи get() для ключей — значение или CacheMarker, без подстановки default."""
+    def_keys = list(dict.fromkeys(def_keys))
+    if not uid and confetti_settings.REGISTRY_SNAPSHOT:
+        return {k: _registry_entry(k)[0] for k in def_keys}
+    gens = _generations(def_keys)
+    keys = {k: _get_keys(k, uid, gens[k]) for k in def_keys}
+    cached = _cache_get_many([key for pair in keys.values() for key in pair if key])
 
-    # user override
-    if uid:
-        sv = SettingValue.objects.filter(
-            definition=defn, scope=SettingScope.USER, user_id=uid
-        ).first()
-        if sv and sv.value is not None:
-            result = bool(sv.value)
-            cache.set(cache_key, result)
-            return result
-
-    # global
-    gv = SettingValue.objects.filter(
-        definition=defn, scope=SettingScope.GLOBAL, user__isnull=True
-    ).first()
-    if gv and gv.value is not None:
-        result = bool(gv.value)
-        cache.set(cache_key, result)
-        return result
-
-    # иначе используем default
-    result = bool(defn.default) if defn.default is not None else bool(default)
-    cache.set(cache_key, result)
+    result: dict[str, Any] = {}
+    misses: list[str] = []
+    for k in def_keys:
+        entry = _entry_from_cache(cached, keys[k])
+        if entry is _MISS:
+            misses.append(k)
+        else:
+            result[k] = entry
+
+    if misses:
+        defs = _fetch_definitions(misses, uid)
+        to_cache: dict[str, Any] = {}
+        for k in misses:
+            result[k] = _resolve_entry(defs.get(k), keys[k], to_cache)
+        _cache_set_many(to_cache)
     return result
+
+def is_enabled_many(flag_keys: Iterable[str], user=None, default=False) -> dict[str, bool]:
+    """Пакетный is_enabled(): один cache.get_many, один SQL-запрос на промахи, один cache.set_many."""
+    return {
+        k: _unwrap_enabled(entry, default)
+        for k, entry in _is_enabled_entries(flag_keys, getattr(user, 'id', None)).items()
+    }
+
+def _is_enabled_entries(flag_keys: Iterable[str], uid=None) -> dict[str, Any]:
+    """Записи is_enabled() для ключей — bool или CacheMarker, без подстановки default."""
+    flag_keys = list(dict.fromkeys(flag_keys))
+    if not uid and confetti_settings.REGISTRY_SNAPSHOT:
+        return {k: _registry_entry(k)[1] for k in flag_keys}
+    gens = _generations(flag_keys)
+    cache_keys = {k: _is_enabled_ck(k, uid, gens[k]) for k in flag_keys}
+    cached = _cache_get_many(list(cache_keys.values()))
+
+    result: dict[str, Any] = {}
+    misses: list[str] = []
+    for k in flag_keys:
+        entry = cached.get(cache_keys[k])
+        if entry is None:
+            misses.append(k)
+        else:
+            result[k] = entry
+
+    if misses:
+        defs = _fetch_definitions(misses, uid)
+        to_cache: dict[str, Any] = {}
+        for k in misses:
+            to_cache[cache_keys[k]] = result[k] = _is_enabled_entry(defs.get(k))
+        _cache_set_many(to_cache)
+    return result
+
+
+# ---------------------------
+# Async API (ASGI)
+# ---------------------------
+
+async def _acache_get_many(keys: list[str]) -> dict[str, Any]:
+    found, keys = _local_lookup(keys)
+    if keys:
+        found.update(_remember_locally(await cache.aget_many(keys)))
+    return found
+
+async def _agenerations(def_keys: Iterable[str]) -> dict[str, str]:
+    """Async-версия _generations."""
+    await _apoll_local_caches()
+    gen_keys = {k: _gen_key(k) for k in def_keys}
+    wanted = [_gen_key(), *gen_keys.values()]
+    found = await _acache_get_many(wanted)
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        initial = time.time_ns()
+        for key in missing:
+            await cache.aadd(key, initial, None)
+        found.update(_remember_locally(await cache.aget_many(missing)))
+    return _format_generations(found, gen_keys)
+
+async def _aregistry_entry(def_key: str) -> tuple[Any, Any] | None:
+    """Async-версия _registry_entry."""
+    if not confetti_settings.REGISTRY_SNAPSHOT:
+        return None
+    await _apoll_local_caches()
+    get_entry, enabled_entry = (await registry.aentries()).get(def_key, _MISSING_ENTRY)
+    return _thaw(get_entry), enabled_entry
+
+async def _aget_entry(def_key: str, uid=None):
+    """
+    Запись get() для ключа: кэш читается асинхронно, промах — тот же _load_get_entry
+    (single-flight на потоковых блокировках), в потоке, как и запросы async ORM.
+    """
+    keys = _get_keys(def_key, uid, (await _agenerations([def_key]))[def_key])
+    entry = _entry_from_cache(await _acache_get_many([key for key in keys if key]), keys)
+    if entry is not _MISS:
+        return entry
+    return await sync_to_async(_load_get_entry)(def_key, uid, keys)
+
+async def _ais_enabled_entry(flag_key: str, uid=None):
+    """Запись is_enabled() для ключа; промах — как в _aget_entry."""
+    gen = (await _agenerations([flag_key]))[flag_key]
+    cache_key = _is_enabled_ck(flag_key, uid, gen)
+    cached = (await _acache_get_many([cache_key])).get(cache_key)
+    if cached is not None:
+        return cached
+    return await sync_to_async(_load_is_enabled_entry)(flag_key, uid, cache_key)
+
+async def aget(def_key: str, user=None, default=None):
+    """Async-версия get(): тот же приоритет, ключи кэша, снимок реестра и контекст запроса."""
+    uid = getattr(user, 'id', None)
+    if not uid and (entry := await _aregistry_entry(def_key)) is not None:
+        return _unwrap(entry[0], default)
+    ctx = request_settings.get()
+    if ctx is not None and await ctx.aserves(uid):
+        return await ctx.aget(def_key, default, for_user=bool(uid))
+    return _unwrap(await _aget_entry(def_key, uid), default)
+
+async def ais_enabled(flag_key: str, user=None, default=False) -> bool:
+    """Async-версия is_enabled()."""
+    uid = getattr(user, 'id', None)
+    if not uid and (entry := await _aregistry_entry(flag_key)) is not None:
+        return _unwrap_enabled(entry[1], default)
+    ctx = request_settings.get()
+    if ctx is not None and await ctx.aserves(uid):
+        return await ctx.ais_enabled(flag_key, default, for_user=bool(uid))
+    return _unwrap_enabled(await _ais_enabled_entry(flag_key, uid), default)
+
+async def aset_value(def_key: str, value, user=None, scope=None):
+    """
+    Async-версия set_value(): тот же upsert, журнал и инвалидация после коммита
+    (_write_values) — в потоке, как и запросы async ORM.
+    """
+    return await sync_to_async(set_value)(def_key, value, user=user, scope=scope)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import permissions, status
+from rest_framework.exceptions import APIException, NotAuthenticated, PermissionDenied, Throttled, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .api import aset_value, with_values
+from .conf import confetti_settings
+from .models import SettingDefinition, SettingScope
+from .payload import IDENTITY, negotiate_encoding, payload_response, render_body
+from .serializers import SettingItemSerializer
+from .validators import validate_value
+from .versions import aversions
+from .views import (FRONTEND_ENCODINGS, _conditional, _defn_dict, _frontend_payload, _frontend_queryset, _list_cache_key, _list_data,
+                    _list_etag_parts, _list_items, _list_queryset, _make_validators, _render, _with_validators)
+
+
+def _user(request):
+    """Пользователь, определённый в _AsyncView.dispatch (DRF-аутентификация); None для анонима."""
+    user = getattr(request, 'user', None)
+    return user if user is not None and user.is_authenticated else None
+
+
+async def _avalidators(user=None, *parts) -> tuple[str, int]:
+    """Async-версия views._validators: те же ETag, что и у синхронных вью."""
+    return _make_validators(*await aversions(user.id if user else None), parts)
+
+
+def _detail_response(defn: SettingDefinition, user):
+    # как SettingDetailView: SettingItemSerializer + RESPONSE_METHOD (ETag общий)
+    body = render_body(confetti_settings.RESPONSE_METHOD(data=SettingItemSerializer(_defn_dict(defn, user)).data))
+    return payload_response({IDENTITY: body}, IDENTITY)
+
+
+def _error(data, code: int) -> JsonResponse:
+    return JsonResponse(data, status=code, json_dumps_params={'ensure_ascii': False})
+
+
+class _AsyncView(View):
+    """
+    Общая часть async-вью, как APIView.initial(): аутентификация, permission_classes
+    и throttle_classes проекта. Как и APIView, вью освобождена от CsrfViewMiddleware —
+    CSRF проверяет SessionAuthentication только для сессионных запросов.
+    Ошибки DRF — тем же JSON, что у синхронных вью.
+    """
+
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # атрибут вместо декоратора csrf_exempt: до Django 5 он оборачивает корутину в sync-функцию
+        view.csrf_exempt = True
+        return view
+
+    def initial(self, request) -> None:
+        """Синхронная часть DRF (аутентификаторы, права, троттлинг); request.user — пользователь DRF."""
+        drf_request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        drf_request.user  # аутентификация; Request выставляет request.user и исходному запросу
+        for permission in (permission() for permission in self.permission_classes):
+            if not permission.has_permission(drf_request, self):
+                if drf_request.authenticators and not drf_request.successful_authenticator:
+                    raise NotAuthenticated()
+                raise PermissionDenied(getattr(permission, 'message', None))
+        waits = [
+            throttle.wait() for throttle in (throttle() for throttle in self.throttle_classes)
+            if not throttle.allow_request(drf_request, self)
+        ]
+        if waits:
+            raise Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            await sync_to_async(self.initial)(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            response = _error({'detail': e.detail}, e.status_code)
+            if getattr(e, 'wait', None):
+                response['Retry-After'] = str(int(e.wait))
+            return response
+
+
+class AsyncSettingListView(_AsyncView):
+    """
+    Async-версия SettingListView: async ORM и async cache. Тело рендерится тем же путём,
+    что у синхронной вью (views._render), поэтому кэш и ETag у них общие.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def get_queryset(self):
+        return SettingDefinition.objects.select_related('category').defer('description')
+
+    async def get(self, request):
+        user = _user(request)
+        is_staff = bool(user and (user.is_staff or user.is_superuser))
+        validators = await _avalidators(user, *_list_etag_parts(request, user, is_staff))
+        not_modified = _conditional(request, validators)
+        if not_modified is not None:
+            return not_modified
+
+        cache_key = _list_cache_key(validators)
+        timeout = confetti_settings.LIST_CACHE_TIMEOUT
+        body = await cache.aget(cache_key) if timeout else None
+        if body is not None:
+            return _with_validators(payload_response({IDENTITY: body}, IDENTITY), validators)
+
+        try:
+            defs, fields, limit = _list_queryset(self.get_queryset(), request.GET, user, is_staff)
+        except ValidationError as e:
+            return _error(e.detail, status.HTTP_400_BAD_REQUEST)
+        items, next_cursor = _list_items([d async for d in defs], user, fields, limit)
+
+        body = _render(_list_data(items, next_cursor, fields, limit))
+        if timeout:
+            await cache.aset(cache_key, body, timeout)
+        return _with_validators(payload_response({IDENTITY: body}, IDENTITY), validators)
+
+
+class AsyncSettingFrontendView(_AsyncView):
+    """Async-версия SettingFrontendView; кэш готовых байтов общий с синхронной вью."""
+
+    permission_classes = [permissions.AllowAny]
+
+    async def get(self, request):
+        # как в SettingFrontendView: версия до тела
+        encoding = negotiate_encoding(request, FRONTEND_ENCODINGS)
+        validators = await _avalidators(None, 'frontend', encoding)
+        not_modified = _conditional(request, validators)
+        if not_modified is not None:
+            return not_modified
+
+        variants = await cache.aget(confetti_settings.FRONTEND_CACHE_PREFIX)
+        if not variants or encoding not in variants:
+            items = [_defn_dict(defn) async for defn in _frontend_queryset()]
+            variants = _frontend_payload(items)
+            await cache.aset(confetti_settings.FRONTEND_CACHE_PREFIX, variants,
+                             confetti_settings.FRONTEND_CACHE_TIMEOUT)
+        return _with_validators(payload_response(variants, encoding), validators)
+
+
+class AsyncSettingDetailView(_AsyncView):
+    """Async-версия SettingDetailView: GET и PATCH с теми же правами."""
+
+    async def get_object(self, key: str, user) -> SettingDefinition | None:
+        qs = with_values(SettingDefinition.objects.select_related('category'), user.id if user else None)
+        if not (user and user.is_superuser):
+            qs = qs.filter(editable=True)
+        return await qs.filter(key=key).afirst()
+
+    async def get(self, request, key: str):
+        user = _user(request)
+        validators = await _avalidators(
+            user, 'detail', key, user.id if user else 'anon', int(bool(user and user.is_superuser)))
+        not_modified = _conditional(request, validators)
+        if not_modified is not None:
+            return not_modified
+
+        defn = await self.get_object(key, user)
+        if not defn:
+            return _error({'message': 'Настройка не найдена'}, status.HTTP_404_NOT_FOUND)
+        return _with_validators(_detail_response(defn, user), validators)
+
+    async def patch(self, request, key: str):
+        user = _user(request)
+        defn = await self.get_object(key, user)
+        if not defn:
+            return _error({'message': 'Настройка не найдена'}, status.HTTP_404_NOT_FOUND)
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return _error({'detail': 'Некорректный JSON'}, status.HTTP_400_BAD_REQUEST)
+        if not isinstance(payload, dict) or 'value' not in payload:
+            return _error({'value': ['Обязательное поле.']}, status.HTTP_400_BAD_REQUEST)
+
+        if payload.get('scope') == SettingScope.GLOBAL:
+            if not (user and (user.is_staff or user.is_superuser)):
+                return _error({'detail': 'Недостаточно прав'}, status.HTTP_403_FORBIDDEN)
+            user_for_value = None
+            scope_used = SettingScope.GLOBAL
+        else:
+            if user is None:
+                return _error({'detail': 'Недостаточно прав'}, status.HTTP_401_UNAUTHORIZED)
+            user_for_value = user
+            scope_used = SettingScope.USER
+
+        try:
+            value = validate_value(defn, payload['value'])
+        except (TypeError, ValueError) as e:
+            return _error({'value': [str(e)]}, status.HTTP_400_BAD_REQUEST)
+
+        await aset_value(defn.key, value, user=user_for_value, scope=scope_used)
+        defn = await self.get_object(key, user)
+        return _detail_response(defn, user_for_value)
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import itertools
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Iterable
+
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .conf import confetti_settings
+from .invalidation import get_invalidation_bus
+from .journal import JournalCursor, asettled_id, settled_id
+from .models import SettingChange
+
+# Изменение: {'id': int, 'key': str, 'scope': 'global' | 'user' | None, 'user_id': ..., 'action': 'save' | 'delete',
+#             'visible': bool}; id — позиция, с которой подписку можно возобновить (subscribe(after=id)),
+# visible — настройка была или стала видна не-staff (editable)
+Change = dict[str, Any]
+
+
+class BaseBroadcast:
+    """
+    Бэкенд ленты изменений настроек.
+    publish() вызывается из сигналов (и пакетной записи) после записи в журнал
+    SettingChange, subscribe() — из SSE-вью.
+    """
+
+    def publish(self, changes: list[Change]) -> None:
+        raise NotImplementedError
+
+    async def last_id(self) -> int:
+        """id последнего изменения: с него подписка получает только новые."""
+        raise NotImplementedError
+
+    async def subscribe(self, after: int | None = None, heartbeat: float = 15) -> AsyncIterator[Change | None]:
+        """
+        Изменения с id > after (after=None — только новые).
+        Если за heartbeat секунд ничего не случилось, отдаёт None.
+        """
+        raise NotImplementedError
+        yield
+
+
+class DatabaseBroadcast(BaseBroadcast):
+    """
+    Подписчики опрашивают журнал SettingChange раз в CHANGES_POLL_INTERVAL.
+    Работает между процессами без внешних сервисов; рассылать ничего не нужно —
+    журнал пишется в той же транзакции, что и изменение. Позиция — JournalCursor:
+    запись, закоммиченная позже соседки с большим id, не теряется.
+    """
+
+    def publish(self, changes: list[Change]) -> None:
+        pass
+
+    async def last_id(self) -> int:
+        # только устоявшаяся позиция: свежие записи лучше повторить, чем пропустить
+        return await asettled_id()
+
+    async def subscribe(self, after: int | None = None, heartbeat: float = 15) -> AsyncIterator[Change | None]:
+        if after is None:
+            after = await self.last_id()
+        cursor = JournalCursor(after)
+        loop = asyncio.get_running_loop()
+        idle_since = loop.time()
+        while True:
+            rows = cursor.advance([row async for row in cursor.pending(500)])
+            for row in rows:
+                # возобновление с id не пропустит ещё не устоявшиеся записи
+                yield {
+                    'id': min(row['id'], cursor.after), 'key': row['key'], 'scope': row['scope'],
+                    'user_id': row['user_id'], 'action': row['action'], 'visible': row['visible'],
+                }
+            if rows:
+                idle_since = loop.time()
+            elif loop.time() - idle_since >= heartbeat:
+                yield None
+                idle_since = loop.time()
+            await asyncio.sleep(confetti_settings.CHANGES_POLL_INTERVAL)
+
+
+class InProcessBroadcast(BaseBroadcast):
+    """
+    Рассылка в памяти процесса (после коммита транзакции), без таблицы.
+    Подходит для одного ASGI-процесса; последние CHANGES_BUFFER_SIZE изменений
+    хранятся для возобновления по Last-Event-ID.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._buffer: deque[Change] = deque(maxlen=confetti_settings.CHANGES_BUFFER_SIZE)
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._lock = threading.Lock()
+
+    def publish(self, changes: list[Change]) -> None:
+        transaction.on_commit(lambda: self._dispatch(changes))
+
+    def _dispatch(self, changes: list[Change]) -> None:
+        with self._lock:
+            numbered = [{**change, 'id': next(self._ids)} for change in changes]
+            self._buffer.extend(numbered)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            for change in numbered:
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, change)
+                except RuntimeError:
+                    # цикл подписчика уже закрыт
+                    pass
+
+    async def last_id(self) -> int:
+        with self._lock:
+            return self._buffer[-1]['id'] if self._buffer else 0
+
+    async def subscribe(self, after: int | None = None, heartbeat: float = 15) -> AsyncIterator[Change | None]:
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.add(subscriber)
+            backlog = [change for change in self._buffer if after is not None and change['id'] > after]
+            if after is None:
+                after = self._buffer[-1]['id'] if self._buffer else 0
+        try:
+            for change in backlog:
+                yield change
+                after = change['id']
+            while True:
+                try:
+                    change = await asyncio.wait_for(subscriber[1].get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if change['id'] > after:
+                    after = change['id']
+                    yield change
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+_backends: dict[type, BaseBroadcast] = {}
+_backends_lock = threading.Lock()
+
+
+def get_broadcast() -> BaseBroadcast | None:
+    """Экземпляр бэкенда из CONFETTI['CHANGES_BACKEND'] (None — лента выключена)."""
+    backend_class = confetti_settings.CHANGES_BACKEND
+    if not backend_class:
+        return None
+    backend = _backends.get(backend_class)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(backend_class)
+            if backend is None:
+                backend = _backends[backend_class] = backend_class()
+    return backend
+
+
+def publish_changes(changes: Iterable[Change]) -> None:
+    """
+    Записывает изменения в журнал (последовательность для дельта-синхронизации),
+    рассылает в ленту и в шину инвалидации процессных кэшей.
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    SettingChange.objects.bulk_create([
+        SettingChange(key=c['key'], scope=c['scope'], user_id=c['user_id'], action=c['action'], visible=c['visible'])
+        for c in changes
+    ])
+    backend = get_broadcast()
+    if backend is not None:
+        backend.publish(changes)
+    bus = get_invalidation_bus()
+    if bus is not None:
+        bus.publish(changes)
+
+
+class ResyncRequired(Exception):
+    """Журнал после запрошенной позиции уже очищен — клиенту нужна полная загрузка."""
+
+    def __init__(self, seq: int):
+        super().__init__(seq)
+        self.seq = seq
+
+
+def changes_since(since: int, uid=None, visible_only: bool = False) -> tuple[int, list[str]]:
+    """
+    Ключи, изменившиеся после позиции since, для глобальной области и пользователя uid;
+    visible_only — только изменения, касающиеся видимых не-staff настроек.
+    Возвращает (позиция для следующего запроса, ключи). Позиция не уходит дальше
+    устоявшейся части журнала (journal.settled_id): свежие ключи могут прийти
+    повторно, но запись, закоммиченная не по порядку id, не потеряется.
+    ResyncRequired, если since старше журнала.
+    """
+    bounds = SettingChange.objects.aggregate(first=Min('id'), last=Max('id'))
+    # последняя запись журнала не удаляется, так что first — граница очистки
+    if bounds['first'] is not None and since < bounds['first'] - 1:
+        raise ResyncRequired(max(settled_id(), bounds['first'] - 1))
+    if since >= (bounds['last'] or 0):
+        return since, []
+    rows = SettingChange.objects.filter(id__gt=since).filter(Q(user__isnull=True) | Q(user_id=uid))
+    if visible_only:
+        rows = rows.filter(visible=True)
+    keys = rows.order_by().values_list('key', flat=True).distinct()
+    return max(since, settled_id()), sorted(keys)
+
+
+def prune_changes(older_than: datetime.timedelta | None = None) -> int:
+    """Удаляет записи журнала старше CHANGES_RETENTION (секунды); самая свежая остаётся всегда."""
+    if older_than is None:
+        older_than = datetime.timedelta(seconds=confetti_settings.CHANGES_RETENTION)
+    last = SettingChange.objects.aggregate(last=Max('id'))['last']
+    if last is None:
+        return 0
+    deleted, _ = SettingChange.objects.filter(
+        created_at__lt=timezone.now() - older_than, id__lt=last,
+    ).delete()
+    return deleted
+
+
+def make_change(key: str, scope=None, user_id=None, action: str = 'save', visible: bool = True) -> Change:
+    return {'key': key, 'scope': scope, 'user_id': user_id, 'action': action, 'visible': visible}
@@ -4,6 +4,49 @@ DEFAULTS = {
     'FRONTEND_CACHE_TIMEOUT': 300, # секунды
     'FRONTEND_CACHE_PREFIX': 'confetti:v1:frontend',
     'CACHE_PREFIX': 'confetti:v1',
+    # Процессный L1-кэш перед django cache (LRU + TTL)
+    'LOCAL_CACHE': False,
+    'LOCAL_CACHE_MAXSIZE': 1024,
+    'LOCAL_CACHE_TIMEOUT': 5, # секунды
+    # Single-flight: холодный ключ пересчитывает один поток/воркер, остальные ждут
+    'SINGLE_FLIGHT': False,
+    'SINGLE_FLIGHT_LEASE': False, # межпроцессная аренда через cache.add
+    'SINGLE_FLIGHT_TIMEOUT': 0.5, # секунды ожидания чужого пересчета
+    'SINGLE_FLIGHT_LEASE_TTL': 5, # секунды жизни аренды (целые: Redis/Memcached дробные округляют до 0)
+    # Снимок реестра в памяти: get/is_enabled без пользователя без сети
+    'REGISTRY_SNAPSHOT': False,
+    'REGISTRY_POLL_INTERVAL': 5, # секунды между сверками версии реестра
+    # Лента изменений (SSE): бэкенд рассылки, None — выключена
+    'CHANGES_BACKEND': 'confetti.changes.DatabaseBroadcast',
+    'CHANGES_POLL_INTERVAL': 1, # секунды между опросами журнала (DatabaseBroadcast)
+    'CHANGES_BUFFER_SIZE': 1000, # изменений в памяти для Last-Event-ID (InProcessBroadcast)
+    'CHANGES_HEARTBEAT': 15, # секунды тишины до keep-alive комментария в потоке
+    # секунды, после которых запись журнала окончательна: дольше транзакция записи не держится.
+    # Позиции (seq, Last-Event-ID) выдаются только до устоявшихся записей
+    'CHANGES_SETTLE_TIME': 10,
+    'CHANGES_RETENTION': 7 * 24 * 3600, # секунды хранения журнала (confetti_prune_changes)
+    # Кэш готового ответа GET /settings/ по пользователю и версиям реестра/override; 0 — выключен
+    'LIST_CACHE_TIMEOUT': 300, # секунды
+    # Async-вью (async ORM/cache) на основных адресах settings/, settings/frontend/, settings/<key>/;
+    # независимо от флага они доступны по async/settings/...
+    'ASYNC_VIEWS': False,
+    # Максимальный limit страницы GET /settings/
+    'LIST_MAX_LIMIT': 1000,
+    # Быстрый путь чтения списков: dict'ы без SettingItemSerializer и рендер сразу в JSON_ENCODER
+    'FAST_SERIALIZATION': False,
+    'JSON_ENCODER': 'confetti.payload.json_dumps', # callable(data) -> bytes; или confetti.payload.orjson_dumps
+    # Шина инвалидации процессных уровней (LOCAL_CACHE, REGISTRY_SNAPSHOT, LocMemCache) между воркерами:
+    # 'confetti.invalidation.DatabaseInvalidationBus' или 'confetti.invalidation.RedisInvalidationBus'; None — выключена
+    'INVALIDATION_BUS': None,
+    'INVALIDATION_POLL_INTERVAL': 1, # секунды между опросами шины — предел задержки
+    'INVALIDATION_BATCH_SIZE': 1000, # изменений за опрос; больше — локальные уровни сбрасываются целиком
+    'INVALIDATION_REDIS_URL': None, # redis://... для RedisInvalidationBus
+    # После коммита записи класть новое значение в кэш get(), а не только удалять старое
+    'CACHE_WRITE_THROUGH': False,
+    # Строк в одной транзакции set_for_users/reset_for_users
+    'BULK_WRITE_CHUNK_SIZE': 1000,
+    # Ключей в одном cache.delete_many (и строк в одной выборке оверрайдов) при инвалидации
+    'INVALIDATION_CHUNK_SIZE': 500,
     # Функция/класс ответа: можно передать объектом или строкой
     'RESPONSE_METHOD': 'confetti.responses.default_response',
     'AUTO_SEED': True,
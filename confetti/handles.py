@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import datetime
+import functools
+from typing import Any, Callable, Iterable
+
+from .api import (
+    CACHE_PREFIX,
+    CACHE_PREFIX_ENABLED,
+    _MISS,
+    _cache_get_many,
+    _cache_set_many,
+    _fetch_definitions,
+    _from_cache,
+    _gen_key,
+    _is_enabled_entry,
+    _load_get,
+    _load_is_enabled,
+    _poll_local_caches,
+    _read_generations,
+    _registry_entry,
+    _resolve_get,
+    _unwrap,
+    _unwrap_enabled,
+    request_settings,
+)
+from .models import SettingDefinition, SettingScope, SettingType, SettingValue
+
+# «взять default вызова» — отличаем от значения настройки, чтобы не приводить default к типу
+_DEFAULT = object()
+
+
+def _parse_datetime(value) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(value)
+
+
+def _parse_duration(value) -> datetime.timedelta:
+    if isinstance(value, datetime.timedelta):
+        return value
+    return datetime.timedelta(seconds=int(value))
+
+
+COERCERS: dict[Any, Callable[[Any], Any]] = {
+    SettingType.BOOL: bool,
+    SettingType.INT: int,
+    SettingType.FLOAT: float,
+    SettingType.STR: str,
+    SettingType.DATETIME: _parse_datetime,
+    SettingType.DURATION: _parse_duration,
+    datetime.datetime: _parse_datetime,
+    datetime.timedelta: _parse_duration,
+}
+
+
+class SettingHandle:
+    """
+    Предкомпилированная ссылка на настройку для горячего кода:
+
+        FEATURE_X = confetti.setting('feature.x', type=int)
+        FEATURE_X.get(request.user)
+
+    Префиксы ключей кэша считаются один раз, значение приводится к типу.
+    type — SettingType, python-тип (int, datetime, timedelta, ...) или callable;
+    без type приведение берётся из SettingDefinition.type при первом обращении.
+    Кэш общий с confetti.api.get / is_enabled.
+    """
+
+    def __init__(self, key: str, type=None, default=None):
+        self.key = key
+        self.default = default
+        self._type = type
+        self._coerce: Callable[[Any], Any] | None = None
+        self._gen_keys = {key: _gen_key(key)}
+        self._value_prefix = f'{CACHE_PREFIX}:{key}:'
+        self._enabled_prefix = f'{CACHE_PREFIX_ENABLED}:{key}:'
+
+    def __repr__(self):
+        return f'<SettingHandle {self.key}>'
+
+    # --- ключи ---
+
+    def _generation(self) -> str:
+        # как api._generations: сначала изменения из других процессов (INVALIDATION_BUS)
+        _poll_local_caches()
+        return _read_generations(self._gen_keys)[self.key]
+
+    def _keys(self, uid, gen: str) -> tuple[str | None, str]:
+        return (f'{self._value_prefix}{gen}:{uid}' if uid else None), f'{self._value_prefix}{gen}:global'
+
+    def _enabled_key(self, uid, gen: str) -> str:
+        return f'{self._enabled_prefix}{gen}:{uid}:enabled'
+
+    # --- приведение типа ---
+
+    def _coercer(self) -> Callable[[Any], Any]:
+        if self._coerce is None:
+            type_ = self._type
+            if type_ is None:
+                type_ = SettingDefinition.objects.filter(key=self.key).values_list('type', flat=True).first()
+            func = COERCERS.get(type_) or (type_ if callable(type_) else None)
+            self._coerce = functools.lru_cache(maxsize=128, typed=True)(func) if func else _identity
+        return self._coerce
+
+    def coerce(self, value):
+        if value is None:
+            return None
+        coerce = self._coercer()
+        try:
+            return coerce(value)
+        except TypeError:
+            # нехешируемое значение (json) — мимо lru_cache
+            return getattr(coerce, '__wrapped__', coerce)(value)
+
+    def _finish(self, value, default):
+        if value is _DEFAULT:
+            return self.default if default is None else default
+        return self.coerce(value)
+
+    # --- чтение ---
+
+    def get(self, user=None, default=None):
+        uid = getattr(user, 'id', None)
+        if not uid and (entry := _registry_entry(self.key)) is not None:
+            return self._finish(_unwrap(entry[0], _DEFAULT), default)
+        ctx = request_settings.get()
+        if ctx is not None and ctx.serves(uid):
+            return self._finish(ctx.get(self.key, _DEFAULT, for_user=bool(uid)), default)
+
+        keys = self._keys(uid, self._generation())
+        value = _from_cache(_cache_get_many([key for key in keys if key]), keys, _DEFAULT)
+        if value is _MISS:
+            value = _load_get(self.key, uid, keys, _DEFAULT)
+        return self._finish(value, default)
+
+    def is_enabled(self, user=None, default=False) -> bool:
+        uid = getattr(user, 'id', None)
+        if not uid and (entry := _registry_entry(self.key)) is not None:
+            return _unwrap_enabled(entry[1], default)
+        ctx = request_settings.get()
+        if ctx is not None and ctx.serves(uid):
+            return ctx.is_enabled(self.key, default, for_user=bool(uid))
+
+        key = self._enabled_key(uid, self._generation())
+        entry = _cache_get_many([key]).get(key)
+        if entry is None:
+            return _load_is_enabled(self.key, uid, key, default)
+        return _unwrap_enabled(entry, default)
+
+    # --- пакетное чтение по пользователям ---
+
+    def _load_for_users(self, uids: list) -> SettingDefinition | None:
+        """Definition с глобальным значением и словарь override по uid (`_overrides`)."""
+        defn = _fetch_definitions([self.key]).get(self.key)
+        if defn is not None:
+            defn._overrides = dict(
+                SettingValue.objects.filter(
+                    definition=defn, scope=SettingScope.USER, user_id__in=[uid for uid in uids if uid],
+                ).values_list('user_id', 'value')
+            )
+        return defn
+
+    def get_many(self, users: Iterable, default=None) -> dict[Any, Any]:
+        """
+        Значение для каждого пользователя: {user_id: значение}.
+        Принимает пользователей или их id. Один cache.get_many и не больше двух запросов.
+        """
+        uids = list(dict.fromkeys(getattr(u, 'id', u) for u in users))
+        gen = self._generation()
+        keys = {uid: self._keys(uid, gen) for uid in uids}
+        cached = _cache_get_many(list({key for pair in keys.values() for key in pair if key}))
+
+        result: dict[Any, Any] = {}
+        misses = []
+        for uid in uids:
+            value = _from_cache(cached, keys[uid], _DEFAULT)
+            if value is _MISS:
+                misses.append(uid)
+            else:
+                result[uid] = self._finish(value, default)
+
+        if misses:
+            defn = self._load_for_users(misses)
+            to_cache: dict[str, Any] = {}
+            for uid in misses:
+                if defn is not None:
+                    defn._user_value = defn._overrides.get(uid)
+                result[uid] = self._finish(_resolve_get(defn, keys[uid], _DEFAULT, to_cache), default)
+            _cache_set_many(to_cache)
+        return result
+
+    def is_enabled_many(self, users: Iterable, default=False) -> dict[Any, bool]:
+        """is_enabled для каждого пользователя: {user_id: bool}."""
+        uids = list(dict.fromkeys(getattr(u, 'id', u) for u in users))
+        gen = self._generation()
+        keys = {uid: self._enabled_key(uid, gen) for uid in uids}
+        cached = _cache_get_many(list(keys.values()))
+
+        result: dict[Any, bool] = {}
+        misses = []
+        for uid in uids:
+            entry = cached.get(keys[uid])
+            if entry is None:
+                misses.append(uid)
+            else:
+                result[uid] = _unwrap_enabled(entry, default)
+
+        if misses:
+            defn = self._load_for_users(misses)
+            to_cache: dict[str, Any] = {}
+            for uid in misses:
+                if defn is not None:
+                    defn._user_value = defn._overrides.get(uid)
+                entry = _is_enabled_entry(defn)
+                to_cache[keys[uid]] = entry
+                result[uid] = _unwrap_enabled(entry, default)
+            _cache_set_many(to_cache)
+        return result
+
+
+def _identity(value):
+    return value
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .conf import confetti_settings
+from .journal import JournalCursor, asettled_id, settled_id
+
+# Изменение в формате confetti.changes: {'key', 'scope', 'user_id', 'action'}
+Change = dict[str, Any]
+
+
+class BaseInvalidationBus:
+    """
+    Шина инвалидации процессных уровней кэша (L1 LocalCache, снимок реестра,
+    django cache на LocMemCache) между воркерами.
+    publish() вызывается при каждом изменении (confetti.changes.publish_changes),
+    poll()/apoll() — на чтении, не чаще INVALIDATION_POLL_INTERVAL секунд.
+    """
+
+    def publish(self, changes: list[Change]) -> None:
+        raise NotImplementedError
+
+    def poll(self) -> list[Change] | None:
+        """Изменения с прошлого опроса; None — часть изменений потеряна, сбросить всё."""
+        raise NotImplementedError
+
+    async def apoll(self) -> list[Change] | None:
+        return self.poll()
+
+
+class DatabaseInvalidationBus(BaseInvalidationBus):
+    """
+    Опрос журнала SettingChange: он пишется в транзакции изменения, внешние сервисы
+    не нужны. Позиция — JournalCursor (записи, закоммиченные не по порядку id,
+    не пропускаются); первый опрос только запоминает её — локальные уровни нового
+    процесса пусты. Если с прошлого опроса накопилось больше INVALIDATION_BATCH_SIZE
+    записей, poll() вернёт None.
+    """
+
+    def __init__(self):
+        self._cursor: JournalCursor | None = None
+
+    def publish(self, changes: list[Change]) -> None:
+        pass
+
+    def _advance(self, rows: list[Change]) -> list[Change] | None:
+        overflow = len(rows) > confetti_settings.INVALIDATION_BATCH_SIZE
+        rows = self._cursor.advance(rows)
+        return None if overflow else rows
+
+    def poll(self) -> list[Change] | None:
+        if self._cursor is None:
+            self._cursor = JournalCursor(settled_id())
+            return []
+        return self._advance(list(self._cursor.pending(confetti_settings.INVALIDATION_BATCH_SIZE + 1)))
+
+    async def apoll(self) -> list[Change] | None:
+        if self._cursor is None:
+            self._cursor = JournalCursor(await asettled_id())
+            return []
+        return self._advance([
+            row async for row in self._cursor.pending(confetti_settings.INVALIDATION_BATCH_SIZE + 1)
+        ])
+
+
+class RedisInvalidationBus(BaseInvalidationBus):
+    """
+    Redis pub/sub (INVALIDATION_REDIS_URL, пакет redis): изменения рассылаются
+    после коммита, фоновый поток подписки складывает чужие изменения в очередь,
+    poll() её забирает. Сообщения не хранятся: после обрыва связи или переполнения
+    очереди (INVALIDATION_BATCH_SIZE) poll() один раз вернёт None.
+    """
+
+    def __init__(self):
+        if redis is None:
+            raise ImproperlyConfigured('RedisInvalidationBus требует пакет redis')
+        if not confetti_settings.INVALIDATION_REDIS_URL:
+            raise ImproperlyConfigured('Для RedisInvalidationBus задайте CONFETTI["INVALIDATION_REDIS_URL"]')
+        self.channel = f'{confetti_settings.CACHE_PREFIX}:invalidation'
+        self._client = redis.Redis.from_url(confetti_settings.INVALIDATION_REDIS_URL)
+        self._origin = uuid.uuid4().hex
+        self._pending: deque[Change] = deque()
+        self._lost = False
+        self._lock = threading.Lock()
+        self._listener: threading.Thread | None = None
+
+    def publish(self, changes: list[Change]) -> None:
+        message = json.dumps({'origin': self._origin, 'changes': changes})
+        transaction.on_commit(lambda: self._client.publish(self.channel, message))
+
+    def _receive(self, data: bytes) -> None:
+        message = json.loads(data)
+        if message['origin'] == self._origin:
+            # свои изменения уже сброшены при записи
+            return
+        with self._lock:
+            if len(self._pending) + len(message['changes']) > confetti_settings.INVALIDATION_BATCH_SIZE:
+                self._lost = True
+                self._pending.clear()
+            else:
+                self._pending.extend(message['changes'])
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self._receive(message['data'])
+            except redis.RedisError:
+                with self._lock:
+                    self._lost = True
+                    self._pending.clear()
+                time.sleep(confetti_settings.INVALIDATION_POLL_INTERVAL)
+
+    def poll(self) -> list[Change] | None:
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name='confetti-invalidation', daemon=True)
+            self._listener.start()
+        with self._lock:
+            if self._lost:
+                self._lost = False
+                return None
+            changes = list(self._pending)
+            self._pending.clear()
+        return changes
+
+
+_buses: dict[type, BaseInvalidationBus] = {}
+_buses_lock = threading.Lock()
+
+
+def get_invalidation_bus() -> BaseInvalidationBus | None:
+    """Экземпляр шины из CONFETTI['INVALIDATION_BUS'] (None — выключена)."""
+    bus_class = confetti_settings.INVALIDATION_BUS
+    if not bus_class:
+        return None
+    bus = _buses.get(bus_class)
+    if bus is None:
+        with _buses_lock:
+            bus = _buses.get(bus_class)
+            if bus is None:
+                bus = _buses[bus_class] = bus_class()
+    return bus
+
+
+class _Throttle:
+    """Не чаще раза в INVALIDATION_POLL_INTERVAL и одним потоком/корутиной за раз."""
+
+    def __init__(self):
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def _due(self) -> bool:
+        return time.monotonic() - self._checked_at >= confetti_settings.INVALIDATION_POLL_INTERVAL
+
+    def acquire(self) -> bool:
+        if not self._due() or not self._lock.acquire(blocking=False):
+            return False
+        if self._due():
+            return True
+        self._lock.release()
+        return False
+
+    def release(self) -> None:
+        self._checked_at = time.monotonic()
+        self._lock.release()
+
+    def reset(self) -> None:
+        self._checked_at = float('-inf')
+
+
+_throttle = _Throttle()
+
+
+def pending_invalidations() -> list[Change] | None:
+    """
+    Изменения из других процессов, которые нужно сбросить из локальных уровней:
+    [] — ничего (шина выключена, опрос не подошёл по времени), None — сбросить всё.
+    """
+    bus = get_invalidation_bus()
+    if bus is None or not _throttle.acquire():
+        return []
+    try:
+        return bus.poll()
+    finally:
+        _throttle.release()
+
+
+async def apending_invalidations() -> list[Change] | None:
+    """Async-версия pending_invalidations()."""
+    bus = get_invalidation_bus()
+    if bus is None or not _throttle.acquire():
+        return []
+    try:
+        return await bus.apoll()
+    finally:
+        _throttle.release()
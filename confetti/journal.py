@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import datetime
+from typing import Any
+
+from django.utils import timezone
+
+from .conf import confetti_settings
+from .models import SettingChange
+
+# Запись журнала в том виде, в каком её читают лента, дельта-синхронизация и шина инвалидации
+Row = dict[str, Any]
+
+_FIELDS = ('id', 'key', 'scope', 'user_id', 'action', 'visible', 'created_at')
+
+
+def settle_horizon() -> datetime.datetime:
+    """
+    Граница «устоявшегося» журнала. id выдаются при INSERT, а видны после COMMIT:
+    транзакция с меньшим id может закоммититься позже записи с большим.
+    Записи старше CHANGES_SETTLE_TIME считаются окончательными — дольше запись
+    настройки в транзакции не держится (часы серверов приложений должны совпадать).
+    """
+    return timezone.now() - datetime.timedelta(seconds=confetti_settings.CHANGES_SETTLE_TIME)
+
+
+def _settled():
+    return (
+        SettingChange.objects.filter(created_at__lte=settle_horizon())
+        .order_by('-id').values_list('id', flat=True)
+    )
+
+
+def settled_id() -> int:
+    """Позиция, до которой пропущенных записей уже не появится (0 — журнал пуст/свеж)."""
+    return _settled().first() or 0
+
+
+async def asettled_id() -> int:
+    return await _settled().afirst() or 0
+
+
+class JournalCursor:
+    """
+    Позиция чтения журнала, устойчивая к коммитам не по порядку id.
+    after двигается только до устоявшихся записей; более свежие уже отданные
+    записи запоминаются и при следующем чтении повторно не возвращаются.
+    """
+
+    def __init__(self, after: int):
+        self.after = after
+        self._seen: set[int] = set()
+
+    def pending(self, limit: int):
+        """Queryset видимых записей после позиции (вместе с уже отданными свежими)."""
+        return SettingChange.objects.filter(id__gt=self.after).order_by('id').values(*_FIELDS)[:limit]
+
+    def advance(self, rows: list[Row]) -> list[Row]:
+        """Сдвигает позицию по прочитанным rows и возвращает ещё не отданные из них."""
+        horizon = settle_horizon()
+        fresh = [row for row in rows if row['id'] not in self._seen]
+        settled = [row['id'] for row in rows if row['created_at'] <= horizon]
+        if settled:
+            self.after = max(self.after, max(settled))
+        self._seen = {row_id for row_id in self._seen | {row['id'] for row in rows} if row_id > self.after}
+        return fresh
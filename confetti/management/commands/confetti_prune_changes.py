@@ -0,0 +1,21 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from confetti.changes import prune_changes
+from confetti.conf import confetti_settings
+
+class Command(BaseCommand):
+    help = 'Удаляет старые записи журнала изменений настроек'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=None,
+            help='Возраст записей в секундах (по умолчанию CONFETTI["CHANGES_RETENTION"])',
+        )
+
+    def handle(self, *args, **options):
+        seconds = options.get('older_than')
+        if seconds is None:
+            seconds = confetti_settings.CHANGES_RETENTION
+        deleted = prune_changes(datetime.timedelta(seconds=seconds))
+        self.stdout.write(self.style.SUCCESS(f'Удалено {deleted} записей журнала'))
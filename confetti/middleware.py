@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from .api import (CacheMarker, _aget_entry, _ais_enabled_entry, _get_entries, _is_enabled_entries, _unwrap,
+                  _unwrap_enabled, request_settings)
+
+
+class SettingsContext:
+    """
+    Настройки в рамках одного запроса (request.confetti).
+    Запрошенные ключи читаются обычным путём (кэш, промахи — одним запросом в БД)
+    и запоминаются до конца запроса: повторные обращения к тому же ключу отвечают из памяти.
+    Каждый новый ключ — два обращения к кэшу (поколения и значение); если ключи известны заранее,
+    preload() читает их одним пакетом.
+    Приоритет тот же, что у confetti.api.get: user override -> global -> definition.default.
+    """
+
+    def __init__(self, request):
+        self._request = request
+        self._user_id = CacheMarker.MISSING
+        self._entries: dict[tuple[str, Any], Any] = {}
+        self._flags: dict[tuple[str, Any], Any] = {}
+
+    @property
+    def user_id(self):
+        if self._user_id is CacheMarker.MISSING:
+            user = getattr(self._request, 'user', None)
+            self._user_id = user.id if user is not None and user.is_authenticated else None
+        return self._user_id
+
+    async def auser_id(self):
+        # request.user ленивый и читает сессию синхронно
+        if self._user_id is CacheMarker.MISSING:
+            await sync_to_async(lambda: self.user_id)()
+        return self._user_id
+
+    def reset(self) -> None:
+        """Забыть прочитанные значения (например, после set_value внутри запроса)."""
+        self._entries.clear()
+        self._flags.clear()
+
+    def serves(self, uid) -> bool:
+        """Может ли контекст ответить за глобальное значение или за пользователя uid."""
+        return uid is None or uid == self.user_id
+
+    async def aserves(self, uid) -> bool:
+        return uid is None or uid == await self.auser_id()
+
+    def preload(self, keys: Iterable[str]) -> None:
+        """Прочитать ключи для текущего пользователя пакетом: get_many по кэшу, промахи — одним запросом в БД."""
+        uid = self.user_id
+        keys = list(dict.fromkeys(keys))
+        for memo, load in ((self._entries, _get_entries), (self._flags, _is_enabled_entries)):
+            wanted = [key for key in keys if (key, uid) not in memo]
+            if wanted:
+                for key, entry in load(wanted, uid).items():
+                    memo[key, uid] = entry
+
+    async def apreload(self, keys: Iterable[str]) -> None:
+        await sync_to_async(self.preload)(keys)
+
+    def _entry(self, memo: dict, load, key: str, for_user: bool):
+        uid = self.user_id if for_user else None
+        if (key, uid) not in memo:
+            memo[key, uid] = load([key], uid)[key]
+        return memo[key, uid]
+
+    async def _aentry(self, memo: dict, aload, key: str, for_user: bool):
+        uid = await self.auser_id() if for_user else None
+        if (key, uid) not in memo:
+            memo[key, uid] = await aload(key, uid)
+        return memo[key, uid]
+
+    def get(self, key: str, default=None, for_user: bool = True) -> Any:
+        return _unwrap(self._entry(self._entries, _get_entries, key, for_user), default)
+
+    def is_enabled(self, key: str, default=False, for_user: bool = True) -> bool:
+        return _unwrap_enabled(self._entry(self._flags, _is_enabled_entries, key, for_user), default)
+
+    async def aget(self, key: str, default=None, for_user: bool = True) -> Any:
+        return _unwrap(await self._aentry(self._entries, _aget_entry, key, for_user), default)
+
+    async def ais_enabled(self, key: str, default=False, for_user: bool = True) -> bool:
+        return _unwrap_enabled(await self._aentry(self._flags, _ais_enabled_entry, key, for_user), default)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        # is_enabled отличает «определения нет» (MISSING) от выключенного (False)
+        return self._entry(self._flags, _is_enabled_entries, key, False) is not CacheMarker.MISSING
+
+
+class ConfettiMiddleware:
+    """
+    Вешает на request атрибут `confetti` (SettingsContext) и делает его текущим
+    для confetti.api.get / is_enabled до конца обработки запроса.
+    Работает и в синхронной, и в асинхронной цепочке middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request.confetti = SettingsContext(request)
+        token = request_settings.set(request.confetti)
+        try:
+            return self.get_response(request)
+        finally:
+            request_settings.reset(token)
+
+    async def __acall__(self, request):
+        request.confetti = SettingsContext(request)
+        token = request_settings.set(request.confetti)
+        try:
+            return await self.get_response(request)
+        finally:
+            request_settings.reset(token)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('confetti', '0003_alter_settingcategory_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettingChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=120, verbose_name='Ключ настройки')),
+                ('scope', models.CharField(blank=True, choices=[('global', 'Глобальная'), ('user', 'Пользовательская')], max_length=15, null=True, verbose_name='scope')),
+                ('action', models.CharField(choices=[('save', 'Сохранение'), ('delete', 'Удаление')], max_length=15, verbose_name='Действие')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Время изменения')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение настройки',
+                'verbose_name_plural': 'Изменения настроек',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('confetti', '0004_settingchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settingchange',
+            name='visible',
+            field=models.BooleanField(default=True, verbose_name='Видно пользователям'),
+        ),
+    ]
@@ -170,3 +170,46 @@ class SettingsSnapshot(models.Model):
 
     def __str__(self):
         return f'Снимок #{self.pk} ({self.created_at:%Y-%m-%d %H:%M:%S})'
+
+
+class SettingChangeAction(models.TextChoices):
+    SAVE = 'save', 'Сохранение'
+    DELETE = 'delete', 'Удаление'
+
+
+class SettingChange(models.Model):
+    """
+    Журнал изменений настроек. Возрастающий id — курсор для ленты изменений (SSE).
+    scope пустой — изменилось само определение настройки.
+    """
+
+    key = models.CharField(max_length=120, verbose_name='Ключ настройки')
+    scope = models.CharField(
+        max_length=15,
+        choices=SettingScope.choices,
+        null=True,
+        blank=True,
+        verbose_name='scope',
+    )
+    # без ограничения FK: запись журнала переживает удаление пользователя
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Пользователь',
+    )
+    action = models.CharField(max_length=15, choices=SettingChangeAction.choices, verbose_name='Действие')
+    # настройка была или стала редактируемой (видна не-staff) — изменение касается обычных клиентов
+    visible = models.BooleanField(default=True, verbose_name='Видно пользователям')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Время изменения')
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Изменение настройки'
+        verbose_name_plural = 'Изменения настроек'
+
+    def __str__(self):
+        return f'#{self.pk} {self.key} {self.action}'
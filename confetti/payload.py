@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .conf import confetti_settings
+
+IDENTITY = 'identity'
+
+# порядок предпочтения при равном q
+_COMPRESSORS = {
+    'br': (lambda body: brotli.compress(body)) if brotli else None,
+    'gzip': lambda body: gzip.compress(body, compresslevel=9, mtime=0),
+}
+
+
+def json_dumps(data) -> bytes:
+    """JSON-кодировщик по умолчанию для быстрого пути: stdlib json, компактно, UTF-8."""
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def orjson_dumps(data) -> bytes:
+    """orjson, если установлен (django-confetti[fast]), иначе json_dumps."""
+    if orjson is None:
+        return json_dumps(data)
+    return orjson.dumps(data, default=DjangoJSONEncoder().default)
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    """Ответ быстрого пути: данные сразу в CONFETTI['JSON_ENCODER'], без DRF-рендера."""
+    return HttpResponse(confetti_settings.JSON_ENCODER(data), status=status, content_type='application/json')
+
+
+def render_body(response) -> bytes:
+    """Готовое JSON-тело ответа RESPONSE_METHOD (DRF Response или JsonResponse)."""
+    if hasattr(response, 'data'):
+        from rest_framework.renderers import JSONRenderer
+        return JSONRenderer().render(response.data)
+    return response.content
+
+
+def render_payload(response) -> dict[str, bytes]:
+    """
+    Готовое тело ответа RESPONSE_METHOD и его сжатые варианты:
+    {'identity': bytes, 'gzip': bytes, 'br': bytes}. br — только если установлен brotli.
+    """
+    return compress_payload(render_body(response))
+
+
+def compress_payload(body: bytes) -> dict[str, bytes]:
+    """Тело ответа и его сжатые варианты."""
+    variants = {IDENTITY: body}
+    for encoding, compress in _COMPRESSORS.items():
+        if compress is not None:
+            variants[encoding] = compress(body)
+    return variants
+
+
+def negotiate_encoding(request, available) -> str:
+    """Лучшая кодировка из Accept-Encoding среди доступных и поддерживаемых (br > gzip > identity)."""
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    accepted = {}
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            accepted[token.lower()] = q
+    best, best_q = IDENTITY, 0.0
+    for encoding, compress in _COMPRESSORS.items():
+        if compress is None or encoding not in available:
+            continue
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def payload_response(variants: dict[str, bytes], encoding: str, status: int = 200) -> HttpResponse:
+    """Ответ из готовых байтов без сериализации и рендера."""
+    response = HttpResponse(variants[encoding], status=status, content_type='application/json')
+    if encoding != IDENTITY:
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(variants[encoding]))
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from asgiref.sync import sync_to_async
+
+from .conf import confetti_settings
+from .versions import registry_version
+
+
+class RegistrySnapshot:
+    """
+    Неизменяемый снимок реестра в памяти процесса (CONFETTI['REGISTRY_SNAPSHOT']):
+    все definition с глобальными значениями. get()/is_enabled() без пользователя
+    становятся поиском по словарю. Раз в REGISTRY_POLL_INTERVAL секунд сверяется
+    версия реестра (confetti.versions), при изменении снимок целиком подменяется новым.
+    """
+
+    def __init__(self):
+        self._entries: Mapping[str, tuple[Any, Any]] = MappingProxyType({})
+        self._version = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Сверить версию при следующем обращении (изменение в этом процессе)."""
+        self._checked_at = float('-inf')
+
+    def _load(self) -> Mapping[str, tuple[Any, Any]]:
+        from .api import _fetch_definitions, _freeze, _global_entry, _is_enabled_entry
+
+        # значения для get() — как в L1: изменяемые хранятся сериализованными, читатели получают копию
+        return MappingProxyType({
+            key: (_freeze(_global_entry(defn)), _is_enabled_entry(defn))
+            for key, defn in _fetch_definitions(None).items()
+        })
+
+    def entries(self) -> Mapping[str, tuple[Any, Any]]:
+        """
+        Снимок {key: (значение для get, значение для is_enabled)} в формате записей кэша;
+        значение для get изменяемого типа — сериализованное (confetti.api._thaw).
+        """
+        now = time.monotonic()
+        if now - self._checked_at < confetti_settings.REGISTRY_POLL_INTERVAL:
+            return self._entries
+        with self._lock:
+            if now - self._checked_at >= confetti_settings.REGISTRY_POLL_INTERVAL:
+                # версию читаем до загрузки: изменение во время загрузки даст перезагрузку
+                version = registry_version()
+                if version != self._version:
+                    self._entries = self._load()
+                    self._version = version
+                self._checked_at = time.monotonic()
+        return self._entries
+
+    def _fresh(self) -> bool:
+        return time.monotonic() - self._checked_at < confetti_settings.REGISTRY_POLL_INTERVAL
+
+    async def aentries(self) -> Mapping[str, tuple[Any, Any]]:
+        """Async-версия entries(): свежий снимок отдаётся сразу, сверка версии и загрузка — в потоке."""
+        if self._fresh():
+            return self._entries
+        return await sync_to_async(self.entries)()
+
+
+registry = RegistrySnapshot()
@@ -17,6 +17,13 @@ class SettingItemSerializer(serializers.Serializer):
     choices = serializers.JSONField(allow_null=True)
     enabled = serializers.BooleanField()
 
+    def __init__(self, *args, fields=None, **kwargs):
+        """fields — подмножество полей ответа (sparse fieldset), None — все."""
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 
 class SettingWriteSerializer(serializers.Serializer):
     value = serializers.JSONField(allow_null=True)
@@ -28,3 +35,8 @@ class SettingWriteSerializer(serializers.Serializer):
         validated_value = validate_value(defn, value)
         attrs['value'] = validated_value
         return attrs
+
+
+class SettingBulkWriteSerializer(serializers.Serializer):
+    values = serializers.DictField(child=serializers.JSONField(allow_null=True), allow_empty=False)
+    scope = serializers.ChoiceField(choices=SettingScope.choices, required=False)
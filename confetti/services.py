@@ -3,10 +3,9 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any
 
-from django.core.cache import cache
 from django.db import transaction
 
-from .api import _ck, _is_enabled_ck
+from .api import bump_registry_generation
 from .models import (
     SettingCategory,
     SettingDefinition,
@@ -86,14 +85,9 @@ def restore_global_settings_snapshot(payload: list[dict[str, Any]]) -> RestoreRe
     }
     stale_definitions = SettingDefinition.objects.exclude(key__in=snapshot_keys)
 
-    stale_keys = list(stale_definitions.values_list("key", flat=True))
     result.deleted_definitions = stale_definitions.count()
     stale_definitions.delete()
 
-    for stale_key in stale_keys:
-        cache.delete(_ck(stale_key, None))
-        cache.delete(_is_enabled_ck(stale_key, None))
-
     for item in payload:
         category_obj = None
         category_data = item.get("category")
@@ -144,7 +138,6 @@ def restore_global_settings_snapshot(payload: list[dict[str, Any]]) -> RestoreRe
             )
             result.updated_global_values += 1
 
-        cache.delete(_ck(definition.key, None))
-        cache.delete(_is_enabled_ck(definition.key, None))
-
+    # после коммита: иначе конкурентное чтение вернёт в кэш значения до восстановления
+    transaction.on_commit(bump_registry_generation)
     return result
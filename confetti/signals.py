@@ -1,41 +1,73 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.core.cache import cache
-from .models import SettingValue, SettingDefinition, SettingScope
+from django.db import transaction
+from .models import SettingValue, SettingDefinition, SettingChangeAction, SettingCategory
 from .conf import confetti_settings
-from .api import _ck, _is_enabled_ck
+from .registry import registry
+from .versions import bump_registry_version
+from .api import _after_write, _invalidate_definitions
+from .changes import make_change, publish_changes
+
+
+def _action(signal) -> str:
+    return SettingChangeAction.DELETE if signal is post_delete else SettingChangeAction.SAVE
+
+
+def _bump_registry() -> None:
+    """Новая версия реестра для снимков в других процессах и сразу — в этом."""
+    bump_registry_version()
+    registry.invalidate()
 
 
 @receiver([post_save, post_delete], sender=SettingValue)
 def purge_value_cache(sender, instance, **kwargs):
     """
-    Когда меняется конкретное значение (глобальное или пользовательское) —
-    инвалидируем соответствующий кэш-ключ.
+    Когда меняется конкретное значение:
+      - пользовательское — удаляем ключи этого пользователя;
+      - глобальное — поднимаем поколение definition: от него зависят
+        и закэшированные результаты is_enabled всех пользователей;
+        для frontend-настройки сбрасываем и frontend-список.
+    Версии реестра/пользователя (ETag в API) поднимаются в обоих случаях,
+    изменение уходит в ленту изменений. Кэш трогаем после коммита транзакции.
     """
-    cache.delete(_ck(instance.definition.key,
-                     instance.user_id if instance.scope == SettingScope.USER else None))
-    cache.delete(_is_enabled_ck(instance.definition.key,
-                                instance.user_id if instance.scope == SettingScope.USER else None))
+    signal = kwargs.get('signal')
+    definition = instance.definition
+    publish_changes([
+        make_change(definition.key, instance.scope, instance.user_id, _action(signal), definition.editable)
+    ])
+    transaction.on_commit(lambda: _after_write([definition], instance.scope, instance.user_id))
 
 
+@receiver(pre_save, sender=SettingDefinition)
+def remember_editable(sender, instance, **kwargs):
+    """editable до сохранения: ставшую скрытой настройку клиенты должны удалить у себя."""
+    instance._confetti_was_editable = (
+        None if instance._state.adding
+        else SettingDefinition.objects.filter(pk=instance.pk).values_list('editable', flat=True).first()
+    )
+
 @receiver([post_save, post_delete], sender=SettingDefinition)
 def purge_definition_cache(sender, instance, **kwargs):
     """
-    Когда меняется определение настройки:
-      - удаляем глобальный кэш ключ
-      - и все ключи для пользовательских оверрайдов этой дефиниции
+    Когда меняется определение настройки — поднимаем его поколение:
+    все глобальные и пользовательские ключи становятся недостижимыми
+    и просто истекают, без обхода оверрайдов.
     """
-    cache.delete(_ck(instance.key), None)
-    cache.delete(_is_enabled_ck(instance.key), None)
-    user_vals =SettingValue.objects.filter(
-        definition=instance,
-        scope=SettingScope.USER,
-    ).only('user_id')
-    for sv in user_vals:
-        cache.delete(_ck(instance.key, sv.user_id))
-        cache.delete(_is_enabled_ck(instance.key, sv.user_id))
-    if instance.frontend:
+    # видно не-staff было до изменения или стало после
+    visible = bool(instance.editable or getattr(instance, '_confetti_was_editable', None))
+    publish_changes([make_change(instance.key, action=_action(kwargs.get('signal')), visible=visible)])
+    # frontend-список сбрасывается всегда: флаг frontend мог только что выключиться
+    transaction.on_commit(lambda: _invalidate_definitions([instance]))
+
+@receiver([post_save, post_delete], sender=SettingCategory)
+def purge_category_cache(sender, instance, **kwargs):
+    """Код/название категории есть в ответах API — новая версия реестра и сброс frontend-списка."""
+    def purge():
         cache.delete(confetti_settings.FRONTEND_CACHE_PREFIX)
+        _bump_registry()
+
+    transaction.on_commit(purge)
 
 def connect_confetti_signals() -> None:
     """
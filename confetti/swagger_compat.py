@@ -26,12 +26,16 @@ class openapi:
         TYPE_OBJECT = _openapi.TYPE_OBJECT
         TYPE_ARRAY = _openapi.TYPE_ARRAY
         TYPE_STRING = _openapi.TYPE_STRING
+        TYPE_INTEGER = _openapi.TYPE_INTEGER
         IN_PATH = _openapi.IN_PATH
+        IN_QUERY = _openapi.IN_QUERY
     else:
         TYPE_OBJECT = 'object'
         TYPE_ARRAY = 'array'
         TYPE_STRING = 'string'
+        TYPE_INTEGER = 'integer'
         IN_PATH = 'path'
+        IN_QUERY = 'query'
 
         class Schema:
             def __init__(self, **kwargs): pass
@@ -1,10 +1,25 @@
 from django.urls import path
-from .views import SettingListView, SettingDetailView, SettingFrontendView
+from .conf import confetti_settings
+from .views import (SettingListView, SettingDetailView, SettingFrontendView, SettingBulkView,
+                    SettingChangeStreamView, SettingChangesView)
+from .async_views import AsyncSettingListView, AsyncSettingDetailView, AsyncSettingFrontendView
 
 app_name = 'django_confetti'
 
+if confetti_settings.ASYNC_VIEWS:
+    list_view, frontend_view, detail_view = AsyncSettingListView, AsyncSettingFrontendView, AsyncSettingDetailView
+else:
+    list_view, frontend_view, detail_view = SettingListView, SettingFrontendView, SettingDetailView
+
 urlpatterns = [
-    path('settings/', SettingListView.as_view(), name='settings-list'),
-    path('settings/frontend/', SettingFrontendView.as_view(), name='settings-frontend'),
-    path('settings/<str:key>/', SettingDetailView.as_view(), name='settings-detail'),
+    path('settings/', list_view.as_view(), name='settings-list'),
+    path('settings/frontend/', frontend_view.as_view(), name='settings-frontend'),
+    path('settings/stream/', SettingChangeStreamView.as_view(), name='settings-stream'),
+    path('settings/changes/', SettingChangesView.as_view(), name='settings-changes'),
+    path('settings/bulk/', SettingBulkView.as_view(), name='settings-bulk'),
+    path('settings/<str:key>/', detail_view.as_view(), name='settings-detail'),
+    # async-версии по отдельным именам
+    path('async/settings/', AsyncSettingListView.as_view(), name='settings-list-async'),
+    path('async/settings/frontend/', AsyncSettingFrontendView.as_view(), name='settings-frontend-async'),
+    path('async/settings/<str:key>/', AsyncSettingDetailView.as_view(), name='settings-detail-async'),
 ]
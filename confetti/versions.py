@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+from typing import Iterable
+
+from django.core.cache import cache
+
+from .conf import confetti_settings
+
+REGISTRY_VERSION_KEY = f'{confetti_settings.CACHE_PREFIX}:registry:version'
+
+
+def _user_version_key(uid) -> str:
+    return f'{confetti_settings.CACHE_PREFIX}:user:{uid}:version'
+
+
+def _read_stamps(keys: list[str]) -> dict[str, int]:
+    """Читает штампы одним cache.get_many; потерянные заводятся заново текущим временем."""
+    found = cache.get_many(keys)
+    missing = [key for key in keys if found.get(key) is None]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return found
+
+
+async def _aread_stamps(keys: list[str]) -> dict[str, int]:
+    """Async-версия _read_stamps."""
+    found = await cache.aget_many(keys)
+    missing = [key for key in keys if found.get(key) is None]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            await cache.aadd(key, now, None)
+        found.update(await cache.aget_many(missing))
+    return found
+
+
+def registry_version() -> int:
+    """
+    Версия реестра: меняется при любом изменении definition или глобального значения.
+    Значение — time.time_ns() момента изменения, поэтому служит и Last-Modified.
+    """
+    return _read_stamps([REGISTRY_VERSION_KEY])[REGISTRY_VERSION_KEY]
+
+
+def versions(uid=None) -> tuple[int, int | None]:
+    """(версия реестра, версия override пользователя uid) — один запрос в кэш."""
+    if not uid:
+        return registry_version(), None
+    user_key = _user_version_key(uid)
+    found = _read_stamps([REGISTRY_VERSION_KEY, user_key])
+    return found[REGISTRY_VERSION_KEY], found[user_key]
+
+
+async def aversions(uid=None) -> tuple[int, int | None]:
+    """Async-версия versions()."""
+    keys = [REGISTRY_VERSION_KEY, *([_user_version_key(uid)] if uid else [])]
+    found = await _aread_stamps(keys)
+    return found[REGISTRY_VERSION_KEY], (found[keys[1]] if uid else None)
+
+
+def bump_registry_version() -> None:
+    cache.set(REGISTRY_VERSION_KEY, time.time_ns(), None)
+
+
+def bump_user_version(uid) -> None:
+    cache.set(_user_version_key(uid), time.time_ns(), None)
+
+
+def bump_user_versions(uids: Iterable) -> None:
+    """bump_user_version для многих пользователей одним cache.set_many."""
+    now = time.time_ns()
+    cache.set_many({_user_version_key(uid): now for uid in uids}, None)
@@ -1,25 +1,47 @@
+import base64
+import binascii
+import hashlib
+import json
 from typing import Optional, Dict
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views import View
 from rest_framework import status, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 
-from .api import set_value
+from .api import set_many, set_value, with_values
 from .swagger_compat import swagger_auto_schema
 from .swagger_compat import openapi
 from .openapi import (SETTING_LIST_RESPONSE, ERROR_429, SETTING_DETAIL_RESPONSE, ERROR_404, ERROR_400, ERROR_401,
                       ERROR_403)
-from .models import SettingDefinition, SettingValue, SettingScope
-from .serializers import SettingItemSerializer, SettingWriteSerializer
+from .models import SettingChangeAction, SettingDefinition, SettingValue, SettingScope
+from .serializers import SettingItemSerializer, SettingWriteSerializer, SettingBulkWriteSerializer
 from .conf import confetti_settings
+from .versions import versions
+from .changes import ResyncRequired, changes_since, get_broadcast
+from .payload import (IDENTITY, compress_payload, json_response, negotiate_encoding, payload_response, render_body,
+                      render_payload)
 
 
 User = get_user_model()
 
 
 def _resolve(defn: SettingDefinition, user: Optional[User]):
-    """Возвращает (global_value, user_value, effective) для одной настройки."""
+    """
+    Возвращает (global_value, user_value, effective) для одной настройки.
+    Если definition пришёл из with_values() — значения уже в аннотациях, без запросов.
+    """
+    if hasattr(defn, '_global_value'):
+        gval = defn._global_value
+        uval = getattr(defn, '_user_value', None) if user and user.is_authenticated else None
+        eff = uval if uval is not None else (gval if gval is not None else defn.default)
+        return gval, uval, eff
+
     gval = SettingValue.objects.filter(
         definition=defn, scope=SettingScope.GLOBAL, user__isnull=True
     ).values_list('value', flat=True).first()
@@ -33,59 +55,271 @@ def _resolve(defn: SettingDefinition, user: Optional[User]):
     eff = uval if uval is not None else (gval if gval is not None else defn.default)
     return gval, uval, eff
 
-def _defn_dict(defn, user=None) -> Dict:
-    gval, uval, eff = _resolve(defn, user)
+# поле ответа -> как его получить из definition, user и (global, user, effective)
+_FIELD_GETTERS = {
+    'key': lambda d, u, v: d.key,
+    'category': lambda d, u, v: getattr(d.category, 'code', None) or getattr(d.category, 'title', ''),
+    'title': lambda d, u, v: d.title,
+    'type': lambda d, u, v: d.type,
+    'default': lambda d, u, v: d.default,
+    'global_value': lambda d, u, v: v[0],
+    'user_value': lambda d, u, v: v[1] if u else None,
+    'effective': lambda d, u, v: v[2] if u else (v[0] if v[0] is not None else d.default),
+    'frontend': lambda d, u, v: d.frontend,
+    'required': lambda d, u, v: d.required,
+    'editable': lambda d, u, v: d.editable,
+    'choices': lambda d, u, v: d.choices,
+    'enabled': lambda d, u, v: d.enabled,
+}
+# поле ответа -> колонки SettingDefinition, без которых его не посчитать
+_FIELD_COLUMNS = {
+    'category': ('category__code', 'category__title'),
+    'global_value': (),
+    'user_value': (),
+    'effective': ('default',),
+}
+_VALUE_FIELDS = frozenset({'global_value', 'user_value', 'effective'})
+
+
+def _defn_dict(defn, user=None, fields=None) -> Dict:
+    """Элемент ответа; fields — подмножество полей, остальные колонки не трогаем."""
+    values = _resolve(defn, user) if fields is None or fields & _VALUE_FIELDS else (None, None, None)
     return {
-        'key': defn.key,
-        'category': getattr(defn.category, 'code', None) or getattr(defn.category, 'title', ''),
-        'title': defn.title,
-        'type': defn.type,
-        'default': defn.default,
-        'global_value': gval,
-        'user_value': uval if user else None,
-        'effective': eff if user else (gval if gval is not None else defn.default),
-        'frontend': defn.frontend,
-        'required': defn.required,
-        'editable': defn.editable,
-        'choices': defn.choices,
-        'enabled': defn.enabled,
+        name: get(defn, user, values)
+        for name, get in _FIELD_GETTERS.items()
+        if fields is None or name in fields
     }
 
+
+def _encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        key = base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        key = ''
+    if not key:
+        raise ValidationError({'cursor': 'Некорректный курсор'})
+    return key
+
+
+def _split_param(params, name: str) -> list[str]:
+    """Список из ?name=a,b и/или ?name=a&name=b."""
+    return [item for raw in params.getlist(name) for item in raw.split(',') if item]
+
+
+def _fields_param(params) -> frozenset | None:
+    fields = _split_param(params, 'fields') or None
+    if fields is not None:
+        unknown = set(fields) - set(_FIELD_GETTERS)
+        if unknown:
+            raise ValidationError({'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'})
+        fields = frozenset(fields)
+    return fields
+
+
+def _page_params(params) -> tuple[int | None, str | None]:
+    limit = params.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError({'limit': 'Ожидается целое число'})
+        if not 1 <= limit <= confetti_settings.LIST_MAX_LIMIT:
+            raise ValidationError({'limit': f'Допустимо от 1 до {confetti_settings.LIST_MAX_LIMIT}'})
+    cursor = params.get('cursor')
+    if cursor is not None:
+        cursor = _decode_cursor(cursor)
+        limit = limit or confetti_settings.LIST_MAX_LIMIT
+    return limit, cursor
+
+
+def _filter_definitions(qs, params, fields=None):
+    """Фильтры из query-параметров и только нужные колонки."""
+    if params.get('category'):
+        qs = qs.filter(category__code=params['category'])
+    if params.get('prefix'):
+        qs = qs.filter(key__startswith=params['prefix'])
+    keys = _split_param(params, 'keys')
+    if keys:
+        qs = qs.filter(key__in=keys)
+    if fields is not None:
+        columns = {'key'}
+        for name in fields:
+            columns.update(_FIELD_COLUMNS.get(name, (name,)))
+        if 'category' not in fields:
+            qs = qs.select_related(None)
+        qs = qs.only(*columns)
+    return qs
+
+
+def _list_queryset(qs, params, user, is_staff: bool):
+    """
+    queryset GET /settings/ по query-параметрам (к БД не обращается)
+    и (fields, limit) для _list_items. Страница берётся с одной лишней строкой.
+    """
+    fields = _fields_param(params)
+    limit, cursor = _page_params(params)
+    if not is_staff:
+        qs = qs.filter(editable=True)
+    qs = _filter_definitions(qs, params, fields)
+    if fields is None or fields & _VALUE_FIELDS:
+        qs = with_values(qs, user.id if user else None)
+    if limit is not None:
+        qs = qs.order_by('key')
+        if cursor is not None:
+            qs = qs.filter(key__gt=cursor)
+        # лишняя строка — признак следующей страницы
+        qs = qs[:limit + 1]
+    return qs, fields, limit
+
+
+def _list_items(defs: list, user, fields, limit) -> tuple[list[Dict], str | None]:
+    """Элементы ответа и курсор следующей страницы из уже загруженных definitions."""
+    next_cursor = None
+    if limit is not None:
+        next_cursor = _encode_cursor(defs[limit - 1].key) if len(defs) > limit else None
+        defs = defs[:limit]
+    return [_defn_dict(d, user, fields) for d in defs], next_cursor
+
+
+def _list_data(items: list[dict], next_cursor, fields, limit):
+    """Данные ответа списка: на быстром пути _defn_dict уже даёт форму ответа, сериализатор не нужен."""
+    data = items if confetti_settings.FAST_SERIALIZATION else SettingItemSerializer(items, many=True, fields=fields).data
+    if limit is not None:
+        data = {'next': next_cursor, 'results': data}
+    return data
+
+
+def _render(data) -> bytes:
+    """
+    Готовое тело ответа так, как его отдаёт синхронная вью (JSON_ENCODER или RESPONSE_METHOD).
+    Async-вью рендерят тем же путём — кэш ответов и ETag у них общие.
+    """
+    if confetti_settings.FAST_SERIALIZATION:
+        return confetti_settings.JSON_ENCODER(data)
+    return render_body(confetti_settings.RESPONSE_METHOD(data=data))
+
+
+# кодировки, в которых _frontend_payload готовит тело (br — если установлен brotli)
+FRONTEND_ENCODINGS = ('br', 'gzip')
+
+
+def _frontend_payload(items: list[dict]) -> dict[str, bytes]:
+    """Тело frontend-списка и его сжатые варианты."""
+    if confetti_settings.FAST_SERIALIZATION:
+        return compress_payload(confetti_settings.JSON_ENCODER(items))
+    return render_payload(confetti_settings.RESPONSE_METHOD(data=SettingItemSerializer(items, many=True).data))
+
+
+def _list_etag_parts(request, user, is_staff: bool) -> tuple:
+    query = request.META.get('QUERY_STRING', '')
+    return (
+        'list', user.id if user else 'anon', int(is_staff),
+        *([hashlib.md5(query.encode()).hexdigest()[:12]] if query else []),
+    )
+
+
+def _list_cache_key(validators) -> str:
+    # ETag уже содержит пользователя, версии реестра/override и параметры запроса —
+    # он же ключ готового ответа; инвалидация — подъёмом версий в signals.py
+    return f'{confetti_settings.CACHE_PREFIX}:list:{validators[0][1:-1]}'
+
+
+def _frontend_queryset():
+    return with_values(
+        SettingDefinition.objects.select_related('category').defer('description').filter(frontend=True)
+    )
+
+
+def _validators(user=None, *parts) -> tuple[str, int]:
+    """
+    ETag и Last-Modified (секунды) по версиям реестра и override пользователя.
+    Только чтение из кэша: проверка условного запроса не трогает БД.
+    """
+    return _make_validators(*versions(user.id if user else None), parts)
+
+
+def _make_validators(registry_ver: int, user_ver: int | None, parts: tuple) -> tuple[str, int]:
+    etag = quote_etag('-'.join(str(p) for p in (f'{registry_ver:x}', f'{user_ver or 0:x}', *parts)))
+    return etag, max(registry_ver, user_ver or 0) // 1_000_000_000
+
+
+def _conditional(request, validators):
+    """304 (или 412), если клиент уже имеет актуальную версию, иначе None."""
+    etag, last_modified = validators
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def _with_validators(response, validators):
+    etag, last_modified = validators
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
 class SettingListView(APIView):
     """
     GET /settings/ - список всех настроек.
     - аноним: только глобальные и default
     - Авторизованный: глобальные + его user-override + effective
+
+    Параметры: category, prefix, keys (через запятую), fields (через запятую),
+    limit / cursor — постраничная выдача по key, ответ {'next': cursor, 'results': [...]}.
     """
 
     permission_classes = [permissions.AllowAny]
-    authentication_classes = []
 
     def get_queryset(self):
-        return SettingDefinition.objects.select_related('category').all()
+        # description в ответе не участвует
+        return SettingDefinition.objects.select_related('category').defer('description')
 
     @swagger_auto_schema(
         operation_id='confetti_setting_list',
         operation_description='Возвращает список всех определений настроек.\n\n'
                               '- Аноним: `global_value`, `default`, `effective = global || default`.\n'
-                              '- Авторизованный: дополнительно `user_value`, `effective` учитывает override.',
+                              '- Авторизованный: дополнительно `user_value`, `effective` учитывает override.\n'
+                              '- С `limit`/`cursor` ответ постраничный: `{"next": cursor, "results": [...]}`.',
         tags=['confetti'],
+        manual_parameters=[
+            openapi.Parameter('category', openapi.IN_QUERY, description='Код категории', type=openapi.TYPE_STRING),
+            openapi.Parameter('prefix', openapi.IN_QUERY, description='Префикс ключа', type=openapi.TYPE_STRING),
+            openapi.Parameter('keys', openapi.IN_QUERY, description='Ключи через запятую', type=openapi.TYPE_STRING),
+            openapi.Parameter('fields', openapi.IN_QUERY, description='Поля ответа через запятую', type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description='Размер страницы', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='Курсор следующей страницы', type=openapi.TYPE_STRING),
+        ],
         responses={
             200: SETTING_LIST_RESPONSE,
+            400: ERROR_400,
             429: ERROR_429,
         },
     )
     def get(self, request):
         user = request.user if getattr(request, 'user', None) and request.user.is_authenticated else None
-        if user and (user.is_staff or user.is_superuser):
-            defs = self.get_queryset()
-        else:
-            defs = self.get_queryset().filter(editable=True)
-        items = []
-        for d in defs:
-            items.append(_defn_dict(d, user))
+        is_staff = bool(user and (user.is_staff or user.is_superuser))
+        validators = _validators(user, *_list_etag_parts(request, user, is_staff))
+        not_modified = _conditional(request, validators)
+        if not_modified is not None:
+            return not_modified
 
-        return confetti_settings.RESPONSE_METHOD(data=SettingItemSerializer(items, many=True).data)
+        cache_key = _list_cache_key(validators)
+        timeout = confetti_settings.LIST_CACHE_TIMEOUT
+        body = cache.get(cache_key) if timeout else None
+        if body is not None:
+            return _with_validators(payload_response({IDENTITY: body}, IDENTITY), validators)
+
+        defs, fields, limit = _list_queryset(self.get_queryset(), request.query_params, user, is_staff)
+        items, next_cursor = _list_items(list(defs), user, fields, limit)
+
+        fast = confetti_settings.FAST_SERIALIZATION
+        data = _list_data(items, next_cursor, fields, limit)
+        response = json_response(data) if fast else confetti_settings.RESPONSE_METHOD(data=data)
+        if timeout:
+            cache.set(cache_key, response.content if fast else render_body(response), timeout)
+        return _with_validators(response, validators)
 
 
 class SettingFrontendView(APIView):
@@ -101,19 +335,23 @@ class SettingFrontendView(APIView):
         },
     )
     def get(self, request):
+        # версия читается до тела: при записи тело сбрасывается раньше подъёма версии,
+        # поэтому с новым ETag старое тело не уйдёт
+        encoding = negotiate_encoding(request, FRONTEND_ENCODINGS)
+        validators = _validators(None, 'frontend', encoding)
+        not_modified = _conditional(request, validators)
+        if not_modified is not None:
+            return not_modified
 
-        cache_frontend = cache.get(f'{confetti_settings.FRONTEND_CACHE_PREFIX}')
-        if cache_frontend:
-            return confetti_settings.RESPONSE_METHOD(
-                data=SettingItemSerializer(cache_frontend, many=True).data)
-
-        defs = SettingDefinition.objects.select_related('category').filter(frontend=True)
-        items = []
-        for defn in defs:
-            items.append(_defn_dict(defn))
-        cache.set(confetti_settings.FRONTEND_CACHE_PREFIX, items, confetti_settings.FRONTEND_CACHE_TIMEOUT)
-        return confetti_settings.RESPONSE_METHOD(data=SettingItemSerializer(items, many=True).data)
-
+        # в кэше — готовые байты ответа и их gzip/br-варианты
+        variants = cache.get(confetti_settings.FRONTEND_CACHE_PREFIX)
+        if not variants or encoding not in variants:
+            items = []
+            for defn in _frontend_queryset():
+                items.append(_defn_dict(defn))
+            variants = _frontend_payload(items)
+            cache.set(confetti_settings.FRONTEND_CACHE_PREFIX, variants, confetti_settings.FRONTEND_CACHE_TIMEOUT)
+        return _with_validators(payload_response(variants, encoding), validators)
 
 
 class SettingDetailView(APIView):
@@ -147,15 +385,20 @@ class SettingDetailView(APIView):
         },
     )
     def get(self, request, key: str):
+        user = request.user if request.user.is_authenticated else None
+        validators = _validators(user, 'detail', key, user.id if user else 'anon', int(bool(user and user.is_superuser)))
+        not_modified = _conditional(request, validators)
+        if not_modified is not None:
+            return not_modified
+
         defn = self.get_object(key)
         if not defn:
             return confetti_settings.RESPONSE_METHOD(
                 data={'message': 'Настройка не найдена'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        user = request.user if request.user.is_authenticated else None
         data = _defn_dict(defn, user)
-        return confetti_settings.RESPONSE_METHOD(data=SettingItemSerializer(data).data)
+        return _with_validators(confetti_settings.RESPONSE_METHOD(data=SettingItemSerializer(data).data), validators)
 
     @swagger_auto_schema(
         operation_id='confetti_setting_patch',
@@ -226,3 +469,180 @@ class SettingDetailView(APIView):
         return confetti_settings.RESPONSE_METHOD(
             data=SettingItemSerializer(_defn_dict(defn, user_for_value)).data
         )
+
+
+class SettingBulkView(APIView):
+    """
+    PATCH /settings/bulk/ - изменить много настроек одним запросом:
+        {"scope": "user" | "global", "values": {"<key>": <value>, ...}}
+    Права — как у PATCH /settings/<key>/. Корректные значения пишутся одной транзакцией,
+    для остальных возвращается ошибка по ключу.
+    """
+
+    @swagger_auto_schema(
+        operation_id='confetti_setting_bulk_patch',
+        operation_description=(
+            'Устанавливает значения нескольких настроек.\n\n'
+            '- По умолчанию (или `scope=\"user\"`): пользовательские значения, требует авторизацию.\n'
+            '- `scope=\"global\"`: глобальные значения (требует `is_staff` или `is_superuser`).\n'
+            '- Ответ: `results` — записанные настройки, `errors` — ошибки по ключам.'
+        ),
+        tags=['confetti'],
+        request_body=SettingBulkWriteSerializer,
+        responses={
+            200: SETTING_LIST_RESPONSE,
+            400: ERROR_400,
+            401: ERROR_401,
+            403: ERROR_403,
+            429: ERROR_429,
+        },
+    )
+    def patch(self, request):
+        serializer = SettingBulkWriteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        values = serializer.validated_data['values']
+        user = request.user if request.user and request.user.is_authenticated else None
+
+        if serializer.validated_data.get('scope') == SettingScope.GLOBAL:
+            if not (user and (user.is_staff or user.is_superuser)):
+                return confetti_settings.RESPONSE_METHOD(
+                    data={'detail': 'Недостаточно прав'},
+                    status=status.HTTP_403_FORBIDDEN)
+            user_for_value = None
+            scope_used = SettingScope.GLOBAL
+        else:
+            if user is None:
+                return confetti_settings.RESPONSE_METHOD(
+                    data={'detail': 'Недостаточно прав'},
+                    status=status.HTTP_401_UNAUTHORIZED)
+            user_for_value = user
+            scope_used = SettingScope.USER
+
+        errors = {}
+        if not user.is_superuser:
+            # как и в SettingDetailView: нередактируемые настройки видны только суперпользователю
+            visible = set(SettingDefinition.objects.filter(
+                key__in=list(values), editable=True).values_list('key', flat=True))
+            errors = {key: 'Настройка не найдена' for key in values if key not in visible}
+            values = {key: value for key, value in values.items() if key in visible}
+
+        written, set_errors = set_many(values, user=user_for_value, scope=scope_used) if values else ({}, {})
+        errors.update(set_errors)
+
+        defs = with_values(
+            SettingDefinition.objects.select_related('category').defer('description').filter(key__in=list(written)),
+            user_for_value.id if user_for_value else None,
+        ) if written else []
+        items = [_defn_dict(defn, user_for_value) for defn in defs]
+        return confetti_settings.RESPONSE_METHOD(
+            data={'results': SettingItemSerializer(items, many=True).data, 'errors': errors},
+            status=status.HTTP_200_OK if written or not errors else status.HTTP_400_BAD_REQUEST)
+
+
+class SettingChangesView(APIView):
+    """
+    GET /settings/changes/?since=<seq> - дельта-синхронизация.
+    Ключи, изменившиеся после seq (глобально и у текущего пользователя):
+    changed — перезапросить, deleted — удалить у себя (определение удалено или стало скрытым).
+    Новый seq — для следующего запроса. Изменения настроек, скрытых от пользователя
+    всё это время, не попадают ни в один список.
+    Если журнал после seq уже очищен — 410 и полная загрузка списка.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(
+        operation_id='confetti_setting_changes',
+        operation_description='Ключи настроек, изменившихся после `since`: '
+                              '`{"seq": <новая позиция>, "changed": [...], "deleted": [...]}`.\n\n'
+                              '410 — журнал очищен, нужна полная синхронизация через `GET /settings/`.',
+        tags=['confetti'],
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, description='Позиция из прошлого ответа (0 — с начала)',
+                              type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            400: ERROR_400,
+            410: openapi.Response(description='Требуется полная синхронизация'),
+            429: ERROR_429,
+        },
+    )
+    def get(self, request):
+        since = request.query_params.get('since', '')
+        if not since.isdigit():
+            raise ValidationError({'since': 'Ожидается неотрицательное целое число'})
+        user = request.user if request.user and request.user.is_authenticated else None
+        is_staff = bool(user and (user.is_staff or user.is_superuser))
+
+        try:
+            # не-staff — только изменения настроек, которые были или стали видны (журнал, visible)
+            seq, keys = changes_since(int(since), user.id if user else None, visible_only=not is_staff)
+        except ResyncRequired as e:
+            return confetti_settings.RESPONSE_METHOD(
+                data={'detail': 'Требуется полная синхронизация', 'resync': True, 'seq': e.seq},
+                status=status.HTTP_410_GONE)
+
+        existing = dict(SettingDefinition.objects.filter(key__in=keys).values_list('key', 'editable')) if keys else {}
+        # как и в списке: нередактируемые настройки видны только staff; ставшая скрытой — для клиента удалена
+        visible = {key for key in keys if key in existing and (is_staff or existing[key])}
+        return confetti_settings.RESPONSE_METHOD(data={
+            'seq': seq,
+            'changed': [key for key in keys if key in visible],
+            'deleted': [key for key in keys if key not in visible],
+        })
+
+
+async def _change_events(backend, after: int, uid, is_staff: bool = False):
+    """
+    Поток SSE: изменения (чужие пользовательские — мимо) и keep-alive комментарии.
+    Не-staff, как и в SettingChangesView, не видят изменений всё время скрытых настроек,
+    а изменение определения, после которого оно скрыто, получают как удаление.
+    """
+    yield f'retry: {int(confetti_settings.CHANGES_POLL_INTERVAL * 1000)}\n\n'
+    async for change in backend.subscribe(after, heartbeat=confetti_settings.CHANGES_HEARTBEAT):
+        if change is None:
+            yield ': keep-alive\n\n'
+            continue
+        if change['user_id'] is not None and change['user_id'] != uid:
+            continue
+        action = change['action']
+        if not is_staff:
+            if not change.get('visible', True):
+                continue
+            if change['scope'] is None and action == SettingChangeAction.SAVE and not await (
+                    SettingDefinition.objects.filter(key=change['key'], editable=True).aexists()):
+                action = SettingChangeAction.DELETE
+        data = json.dumps({'key': change['key'], 'scope': change['scope'], 'action': action})
+        yield f'id: {change["id"]}\nevent: change\ndata: {data}\n\n'
+
+
+class SettingChangeStreamView(View):
+    """
+    GET /settings/stream/ - лента изменений настроек (Server-Sent Events).
+    Событие `change`: {"key", "scope", "action"}; scope null — изменилось определение.
+    Пользователь получает глобальные изменения и свои override; нередактируемые
+    настройки — только staff.
+    Возобновление с места обрыва — заголовок Last-Event-ID (или ?last_event_id=).
+    Асинхронная вью: под ASGI соединение не занимает поток.
+    """
+
+    async def get(self, request):
+        backend = get_broadcast()
+        if backend is None:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+
+        if hasattr(request, 'auser'):
+            user = await request.auser()
+        else:
+            user = getattr(request, 'user', None)
+        uid = user.id if user is not None and user.is_authenticated else None
+        is_staff = bool(uid and (user.is_staff or user.is_superuser))
+
+        last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        # позиция фиксируется до начала потока: изменения после ответа не потеряются
+        after = int(last_id) if last_id and last_id.isdigit() else await backend.last_id()
+
+        response = StreamingHttpResponse(_change_events(backend, after, uid, is_staff), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -111,9 +111,51 @@ def user(db):
 @pytest.fixture(autouse=True)
 def _clear_cache_and_reload_confetti(settings):
     from django.core.cache import cache
+    from confetti.api import local_cache
+    from confetti.registry import registry
     cache.clear()
+    local_cache.clear()
+    registry.invalidate()
     from confetti.conf import confetti_settings
     confetti_settings.reload()
     yield
     cache.clear()
+    local_cache.clear()
     confetti_settings.reload()
+
+@pytest.fixture(autouse=True)
+def _on_commit_in_test_transaction(request, monkeypatch):
+    """
+    Тест с django_db идёт внутри транзакции, которая никогда не коммитится, и колбэки
+    transaction.on_commit (инвалидация кэша confetti) не срабатывают. Возврат на уровень самого
+    теста считаем коммитом: колбэки, отложенные там или во вложенном atomic(), выполняются сразу
+    (отменённые откатом savepoint Django отбрасывает сам).
+    """
+    marker = request.node.get_closest_marker('django_db')
+    if marker is not None and not marker.kwargs.get('transaction') and 'transactional_db' not in request.fixturenames:
+        request.getfixturevalue('db')
+        from django.db import transaction
+        connection = transaction.get_connection()
+        depth, pending = len(connection.atomic_blocks), len(connection.run_on_commit)
+        on_commit, atomic_exit = transaction.on_commit, transaction.Atomic.__exit__
+
+        def run_committed():
+            callbacks = connection.run_on_commit[pending:]
+            del connection.run_on_commit[pending:]
+            for callback in callbacks:
+                callback[1]()
+
+        def immediate(func, using=None, **kwargs):
+            if transaction.get_connection(using) is connection and len(connection.atomic_blocks) <= depth:
+                return func()
+            return on_commit(func, using, **kwargs)
+
+        def exit_(self, *exc_info):
+            result = atomic_exit(self, *exc_info)
+            if transaction.get_connection(self.using) is connection and len(connection.atomic_blocks) == depth:
+                run_committed()
+            return result
+
+        monkeypatch.setattr(transaction, 'on_commit', immediate)
+        monkeypatch.setattr(transaction.Atomic, '__exit__', exit_)
+    yield
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+
+from confetti import api
+from confetti.api import _ck, aget, ais_enabled, aset_value, get, is_enabled, request_settings, set_value
+from confetti.middleware import SettingsContext
+from confetti.models import SettingChange, SettingScope, SettingValue
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def test_aget_matches_get(user):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert async_to_sync(aget)('ui.theme') == 'dark'
+    assert async_to_sync(aget)('ui.theme', user=user) == 'dark'
+    assert async_to_sync(aget)('missing.key', default=3) == 3
+    # прогретый async-вызовом кэш читается синхронным get()
+    assert get('ui.theme', user=user) == 'dark'
+
+
+def test_aset_value_invalidates(user):
+    assert async_to_sync(aget)('ui.theme', user=user) == 'light'
+    async_to_sync(aset_value)('ui.theme', 'dark', user=user)
+    assert SettingValue.objects.get(scope=SettingScope.USER, user=user).value == 'dark'
+    assert async_to_sync(aget)('ui.theme', user=user) == 'dark'
+    assert get('ui.theme') == 'light'
+
+
+def test_ais_enabled(user):
+    assert async_to_sync(ais_enabled)('front', user=user) is True
+    async_to_sync(aset_value)('front', False, scope=SettingScope.GLOBAL)
+    assert async_to_sync(ais_enabled)('front', user=user) is False
+    assert is_enabled('front') is False
+    assert async_to_sync(ais_enabled)('missing.flag', default=True) is True
+
+
+def _fail(*args, **kwargs):
+    pytest.fail('unexpected load')
+
+
+def test_aset_value_uses_upsert_and_journal(user, monkeypatch):
+    calls = []
+    write_values = api._write_values
+    monkeypatch.setattr(api, '_write_values', lambda *args: calls.append(args) or write_values(*args))
+
+    row = async_to_sync(aset_value)('ui.theme', 'dark', user=user)
+    async_to_sync(aset_value)('ui.theme', 'light', user=user)
+    assert len(calls) == 2
+    assert row.pk == SettingValue.objects.get(scope=SettingScope.USER, user=user).pk
+    # одна запись журнала на изменение: без post_save-пути
+    assert SettingChange.objects.filter(key='ui.theme', user_id=user.pk).count() == 2
+
+
+def test_async_reads_use_registry_snapshot(settings, django_assert_num_queries, monkeypatch):
+    settings.CONFETTI = {**settings.CONFETTI, 'REGISTRY_SNAPSHOT': True, 'REGISTRY_POLL_INTERVAL': 60}
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert get('ui.theme') == 'dark'
+
+    monkeypatch.setattr(api, '_aget_entry', _fail)
+    monkeypatch.setattr(api, '_ais_enabled_entry', _fail)
+    with django_assert_num_queries(0):
+        assert async_to_sync(aget)('ui.theme') == 'dark'
+        assert async_to_sync(ais_enabled)('front') is True
+        assert async_to_sync(ais_enabled)('missing.flag', default=True) is True
+
+
+def test_async_reads_use_request_context(user, monkeypatch):
+    request = RequestFactory().get('/')
+    request.user = user
+    ctx = SettingsContext(request)
+
+    async def scenario():
+        token = request_settings.set(ctx)
+        try:
+            assert await aget('ui.theme', user=user) == 'light'
+            assert await ais_enabled('front', user=user) is True
+            # повторные обращения — из памяти контекста
+            with monkeypatch.context() as patch:
+                patch.setattr('confetti.middleware._aget_entry', _fail)
+                patch.setattr('confetti.middleware._ais_enabled_entry', _fail)
+                assert await aget('ui.theme', user=user) == 'light'
+                assert await ais_enabled('front', user=user) is True
+            # запись сбрасывает контекст
+            await aset_value('ui.theme', 'dark', user=user)
+            return await aget('ui.theme', user=user)
+        finally:
+            request_settings.reset(token)
+
+    assert async_to_sync(scenario)() == 'dark'
+
+
+def test_async_misses_resolve_once(settings, monkeypatch):
+    settings.CONFETTI = {**settings.CONFETTI, 'SINGLE_FLIGHT': True, 'SINGLE_FLIGHT_TIMEOUT': 2}
+    calls = []
+    monkeypatch.setattr(api, '_fetch_definitions', lambda def_keys, uid=None: calls.append(list(def_keys)) or {})
+    _ck('cold.key')  # счётчики поколений заводим заранее
+
+    async def burst():
+        return await asyncio.gather(*(aget('cold.key', default=1) for _ in range(5)))
+
+    assert async_to_sync(burst)() == [1] * 5
+    assert len(calls) == 1
@@ -1,5 +1,5 @@
 import pytest
-from confetti.api import get, set_value
+from confetti.api import get, is_enabled, set_value
 from confetti.models import SettingScope, SettingDefinition
 from django.core.cache import cache
 from icecream import ic
@@ -45,3 +45,102 @@ def test_edit_not_editable(user):
     dfn = SettingDefinition.objects.get(key='edit')
     assert dfn.editable is False
     assert get('edit') == False
+
+
+def test_default_resolution_is_cached(django_assert_num_queries):
+    """Значение из definition.default кэшируется, повторный вызов не ходит в БД."""
+    assert get('ui.theme') == 'light'
+    with django_assert_num_queries(0):
+        assert get('ui.theme') == 'light'
+
+
+def test_user_without_override_is_cached(user, django_assert_num_queries):
+    """Отсутствие user override тоже кэшируется."""
+    assert get('ui.theme', user=user) == 'light'
+    with django_assert_num_queries(0):
+        assert get('ui.theme', user=user) == 'light'
+
+    set_value('ui.theme', 'dark', user=user)
+    assert get('ui.theme', user=user) == 'dark'
+
+
+def test_missing_definition_is_cached(django_assert_num_queries):
+    """Отсутствующая настройка кэшируется маркером, default вызова не попадает в кэш."""
+    assert get('missing.key', default=1) == 1
+    with django_assert_num_queries(0):
+        assert get('missing.key', default=2) == 2
+        assert get('missing.key') is None
+
+    SettingDefinition.objects.create(key='missing.key', type='int', title='Missing', default=5)
+    assert get('missing.key', default=1) == 5
+
+
+def test_cache_miss_resolves_in_single_query(user, django_assert_num_queries):
+    """Промах кэша в get()/is_enabled() — ровно один SQL-запрос."""
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    set_value('front', False, user=user)
+    cache.clear()
+
+    with django_assert_num_queries(1):
+        assert get('ui.theme', user=user) == 'dark'
+    with django_assert_num_queries(1):
+        assert get('front', user=user) is False
+    with django_assert_num_queries(1):
+        assert is_enabled('front', user=user) is False
+    with django_assert_num_queries(1):
+        assert is_enabled('front') is True
+    with django_assert_num_queries(0):
+        assert get('ui.theme', user=user) == 'dark'
+        assert is_enabled('front', user=user) is False
+
+
+def test_disabled_definition_in_single_query(django_assert_num_queries):
+    SettingDefinition.objects.filter(key='ui.theme').update(enabled=False)
+    with django_assert_num_queries(1):
+        assert get('ui.theme', default='x') == 'x'
+    with django_assert_num_queries(1):
+        assert is_enabled('ui.theme', default=True) is False
+
+
+def test_set_value_is_single_upsert(user):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from confetti.models import SettingValue
+
+    set_value('ui.theme', 'dark', user=user)
+    for value in ('light', 'dark'):
+        with CaptureQueriesContext(connection) as ctx:
+            set_value('ui.theme', value, user=user)
+        writes = [q['sql'] for q in ctx.captured_queries if 'confetti_settingvalue' in q['sql']]
+        assert len(writes) == 1 and 'ON CONFLICT' in writes[0]
+        assert not any('confetti_settingdefinition' in q['sql'] for q in ctx.captured_queries[1:])
+    assert SettingValue.objects.get(user=user).value == 'dark'
+    assert get('ui.theme', user=user) == 'dark'
+
+    # глобальное: UPDATE, INSERT только при первом сохранении
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    with CaptureQueriesContext(connection) as ctx:
+        set_value('ui.theme', 'light', scope=SettingScope.GLOBAL)
+    writes = [
+        q['sql'] for q in ctx.captured_queries
+        if 'confetti_settingvalue' in q['sql'] and q['sql'].startswith(('UPDATE', 'INSERT'))
+    ]
+    assert len(writes) == 1 and writes[0].startswith('UPDATE')
+    assert get('ui.theme') == 'light'
+
+
+@pytest.mark.parametrize('upsert', [True, False])
+def test_set_value_returns_stored_row(user, monkeypatch, upsert):
+    from django.db import connection
+    from confetti.models import SettingValue
+
+    monkeypatch.setattr(connection.features, 'supports_update_conflicts_with_target', upsert)
+    for kwargs in ({'scope': SettingScope.GLOBAL}, {'user': user}):
+        first = set_value('ui.theme', 'dark', **kwargs)
+        sv = set_value('ui.theme', 'light', **kwargs)
+        assert sv.pk == first.pk is not None
+        assert not sv._state.adding
+        # save() на результате обновляет ту же строку, а не вставляет вторую
+        sv.value = 'dark'
+        sv.save()
+    assert SettingValue.objects.filter(definition__key='ui.theme').count() == 2
@@ -0,0 +1,126 @@
+import pytest
+
+from confetti.api import get, get_many, is_enabled, is_enabled_many, set_many, set_value
+from confetti.models import SettingDefinition, SettingScope, SettingValue
+
+pytestmark = pytest.mark.django_db
+
+KEYS = ['ui.theme', 'feature.jobs', 'front', 'missing.key']
+
+
+def test_get_many_matches_get(user):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    set_value('front', False, user=user)
+    SettingDefinition.objects.filter(key='feature.jobs').update(enabled=False)
+
+    expected = {k: get(k, user=user, default='x') for k in KEYS}
+    from django.core.cache import cache
+    cache.clear()
+    assert get_many(KEYS, user=user, default='x') == expected
+    # и из кэша результат тот же
+    assert get_many(KEYS, user=user, default='x') == expected
+
+
+def test_get_many_single_query_then_cached(user, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        values = get_many(KEYS, user=user)
+    assert values == {'ui.theme': 'light', 'feature.jobs': True, 'front': True, 'missing.key': None}
+
+    with django_assert_num_queries(0):
+        assert get_many(KEYS, user=user) == values
+        # кэш общий с одиночным get()
+        assert get('ui.theme', user=user) == 'light'
+
+
+def test_is_enabled_many(user, django_assert_num_queries):
+    set_value('front', False, user=user)
+    with django_assert_num_queries(1):
+        flags = is_enabled_many(['feature.jobs', 'front', 'missing.flag'], user=user)
+    assert flags == {'feature.jobs': True, 'front': False, 'missing.flag': False}
+
+    with django_assert_num_queries(0):
+        assert is_enabled_many(['front', 'missing.flag'], user=user, default=True) == {
+            'front': False, 'missing.flag': True,
+        }
+        assert is_enabled('front', user=user) is False
+
+
+def test_set_many_user_scope(user):
+    assert get('ui.theme', user=user) == 'light'
+    assert is_enabled('front', user=user) is True
+    set_value('front', True, user=user)
+
+    written, errors = set_many({'ui.theme': 'dark', 'front': False, 'feature.jobs': 'nope', 'missing.key': 1}, user=user)
+    assert written == {'ui.theme': 'dark', 'front': False}
+    assert set(errors) == {'feature.jobs', 'missing.key'}
+
+    # закэшированные значения пользователя сброшены
+    assert get('ui.theme', user=user) == 'dark'
+    assert is_enabled('front', user=user) is False
+    assert get('ui.theme') == 'light'
+    assert SettingValue.objects.filter(user=user).count() == 2
+
+
+def test_set_many_global_scope(user, django_assert_max_num_queries):
+    assert get('ui.theme') == 'light'
+    assert get('front', user=user) is True
+    set_value('front', True, scope=SettingScope.GLOBAL)
+
+    with django_assert_max_num_queries(7):
+        written, errors = set_many({'ui.theme': 'dark', 'front': False, 'edit': True}, scope=SettingScope.GLOBAL)
+    assert errors == {}
+    # нередактируемая настройка получает default
+    assert written['edit'] == SettingDefinition.objects.get(key='edit').default
+
+    assert get('ui.theme') == 'dark'
+    assert get('front', user=user) is False
+    assert SettingValue.objects.filter(scope=SettingScope.GLOBAL).count() == 3
+
+
+def test_set_for_users_validates_once_and_invalidates(user, django_user_model, settings, monkeypatch):
+    from confetti import api
+    from confetti.api import reset_for_users, set_for_users
+
+    settings.CONFETTI = {**settings.CONFETTI, 'BULK_WRITE_CHUNK_SIZE': 2}
+    users = [user, *(django_user_model.objects.create(username=f'u{i}') for i in range(4))]
+    set_value('front', True, user=users[0])
+    assert [is_enabled('front', user=u) for u in users] == [True] * 5
+
+    calls = []
+    validate = api.validate_value
+    monkeypatch.setattr(api, 'validate_value', lambda defn, value: calls.append(value) or validate(defn, value))
+    written, errors = set_for_users('front', {u.id: False for u in users[:4]} | {users[4].id: 'x'})
+
+    assert calls == [False, 'x']
+    assert written == {u.id: False for u in users[:4]}
+    assert list(errors) == [users[4].id]
+    assert [is_enabled('front', user=u) for u in users] == [False] * 4 + [True]
+    assert SettingValue.objects.filter(definition__key='front', scope=SettingScope.USER).count() == 4
+
+    assert reset_for_users('front', [u.id for u in users]) == 4
+    assert not SettingValue.objects.filter(definition__key='front', scope=SettingScope.USER).exists()
+    assert [is_enabled('front', user=u) for u in users] == [True] * 5
+
+
+def test_set_for_users_in_chunked_queries(user, django_user_model, settings, django_assert_max_num_queries):
+    from confetti.api import set_for_users
+
+    settings.CONFETTI = {**settings.CONFETTI, 'BULK_WRITE_CHUNK_SIZE': 100}
+    users = [django_user_model.objects.create(username=f'u{i}') for i in range(200)]
+    # definition + на пачку: BEGIN, upsert, журнал, COMMIT
+    with django_assert_max_num_queries(1 + 2 * 4):
+        set_for_users('ui.theme', {u.id: 'dark' for u in users})
+    assert get('ui.theme', user=users[-1]) == 'dark'
+
+
+def test_set_for_users_without_upsert_support(user, django_user_model, monkeypatch):
+    from django.db import connection
+    from confetti.api import set_for_users
+
+    other = django_user_model.objects.create(username='other')
+    set_value('ui.theme', 'light', user=user)
+    monkeypatch.setattr(connection.features, 'supports_update_conflicts_with_target', False)
+    set_for_users('ui.theme', {user.id: 'dark', other.id: 'dark'})
+
+    values = SettingValue.objects.filter(definition__key='ui.theme', scope=SettingScope.USER)
+    assert sorted(values.values_list('user_id', 'value')) == [(user.id, 'dark'), (other.id, 'dark')]
@@ -0,0 +1,136 @@
+import base64
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+
+from confetti.api import set_value
+from confetti.models import SettingScope
+
+drf = pytest.importorskip('rest_framework')
+from rest_framework.test import APIClient
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def indented_json(data) -> bytes:
+    # отличается от рендера RESPONSE_METHOD — расхождение путей рендера видно по байтам
+    return json.dumps(data, indent=2).encode()
+
+
+@pytest.fixture
+def async_client():
+    return AsyncClient()
+
+
+def _get(client, url, **extra):
+    return async_to_sync(client.get)(url, **extra)
+
+
+@pytest.mark.parametrize('fast', [False, True])
+def test_async_list_shares_cache_with_sync(async_client, client, user, settings, fast):
+    settings.CONFETTI = {**settings.CONFETTI, 'FAST_SERIALIZATION': fast,
+                         'JSON_ENCODER': 'tests.test_async_views.indented_json'}
+    set_value('ui.theme', 'dark', user=user)
+    # обе вью видят пользователя по настоящей сессии
+    client.force_login(user)
+    async_client.force_login(user)
+
+    for query in ('', '?fields=key,effective', '?prefix=ui.&limit=1'):
+        sync = client.get(reverse('confetti:settings-list') + query)
+        # ответ async-вью берётся из кэша синхронной и должен совпадать байт в байт
+        cached = _get(async_client, reverse('confetti:settings-list-async') + query)
+        assert (cached.status_code, cached['ETag'], cached.content) == (200, sync['ETag'], sync.content)
+
+        # сама async-вью рендерит то же тело (версии в ETag после clear() новые)
+        from django.core.cache import cache
+        cache.clear()
+        assert _get(async_client, reverse('confetti:settings-list-async') + query).content == sync.content
+
+    assert _get(async_client, reverse('confetti:settings-list-async') + '?limit=0').status_code == 400
+
+
+def test_async_views_use_drf_authentication(async_client, user):
+    user.set_password('secret')
+    user.save()
+    set_value('ui.theme', 'dark', user=user)
+    url = reverse('confetti:settings-detail-async', kwargs={'key': 'ui.theme'})
+
+    basic = 'Basic ' + base64.b64encode(b'user:secret').decode()
+    assert _get(async_client, url, headers={'Authorization': basic}).json()['user_value'] == 'dark'
+
+    wrong = 'Basic ' + base64.b64encode(b'user:wrong').decode()
+    assert _get(async_client, url, headers={'Authorization': wrong}).status_code == 401
+
+
+@pytest.mark.parametrize('fast', [False, True])
+def test_async_frontend_shares_cache_and_etag(async_client, settings, fast):
+    settings.CONFETTI = {**settings.CONFETTI, 'FAST_SERIALIZATION': fast,
+                         'JSON_ENCODER': 'tests.test_async_views.indented_json'}
+    sync = APIClient().get(reverse('confetti:settings-frontend'))
+    r = _get(async_client, reverse('confetti:settings-frontend-async'), headers={'If-None-Match': sync['ETag']})
+    assert r.status_code == 304
+    from django.core.cache import cache
+    cache.clear()
+    assert _get(async_client, reverse('confetti:settings-frontend-async')).content == sync.content
+
+    set_value('front', False, scope=SettingScope.GLOBAL)
+    r = _get(async_client, reverse('confetti:settings-frontend-async'), headers={'If-None-Match': sync['ETag']})
+    assert r.status_code == 200
+    assert r.json()[0]['effective'] is False
+
+
+def test_async_detail_get_and_patch(async_client, user):
+    url = reverse('confetti:settings-detail-async', kwargs={'key': 'ui.theme'})
+    assert _get(async_client, url).json()['effective'] == 'light'
+    assert _get(async_client, reverse('confetti:settings-detail-async', kwargs={'key': 'edit'})).status_code == 404
+
+    patch = async_to_sync(async_client.patch)
+    assert patch(url, {'value': 'dark'}, content_type='application/json').status_code == 401
+
+    async_client.force_login(user)
+    r = patch(url, {'value': 'dark'}, content_type='application/json')
+    assert r.status_code == 200
+    assert r.json()['user_value'] == 'dark'
+    assert patch(url, {'value': 'blue'}, content_type='application/json').status_code == 400
+    assert patch(url, {'value': 'dark', 'scope': 'global'}, content_type='application/json').status_code == 403
+
+    assert _get(async_client, url).json()['effective'] == 'dark'
+
+
+def test_async_patch_csrf_like_drf(user):
+    user.set_password('secret')
+    user.save()
+    url = reverse('confetti:settings-detail-async', kwargs={'key': 'ui.theme'})
+    client = AsyncClient(enforce_csrf_checks=True)
+    patch = async_to_sync(client.patch)
+
+    # токены/Basic не требуют CSRF-токена, как у APIView
+    basic = 'Basic ' + base64.b64encode(b'user:secret').decode()
+    r = patch(url, {'value': 'dark'}, content_type='application/json', headers={'Authorization': basic})
+    assert r.status_code == 200
+    assert r.json()['user_value'] == 'dark'
+
+    # сессию проверяет SessionAuthentication
+    client.force_login(user)
+    r = patch(url, {'value': 'light'}, content_type='application/json')
+    assert r.status_code == 403
+    assert 'CSRF' in r.json()['detail']
+
+
+def test_async_views_apply_throttles(async_client, monkeypatch):
+    from rest_framework.throttling import AnonRateThrottle
+
+    from confetti.async_views import _AsyncView
+
+    class OnePerMinute(AnonRateThrottle):
+        rate = '1/min'
+
+    monkeypatch.setattr(_AsyncView, 'throttle_classes', [OnePerMinute])
+    url = reverse('confetti:settings-frontend-async')
+    assert _get(async_client, url).status_code == 200
+    r = _get(async_client, url)
+    assert r.status_code == 429
+    assert r['Retry-After']
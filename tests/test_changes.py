@@ -0,0 +1,241 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+
+from confetti.api import set_many, set_value
+from confetti.changes import InProcessBroadcast, get_broadcast
+from confetti.models import SettingChange, SettingDefinition, SettingScope
+
+drf = pytest.importorskip('rest_framework')
+from confetti.views import SettingChangeStreamView
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture(autouse=True)
+def settled_now(settings):
+    """Записи журнала окончательны сразу — позиции в тестах детерминированы."""
+    settings.CONFETTI = {**settings.CONFETTI, 'CHANGES_SETTLE_TIME': 0}
+
+
+@pytest.fixture
+def fast_poll(settings):
+    settings.CONFETTI = {**settings.CONFETTI, 'CHANGES_POLL_INTERVAL': 0.01}
+
+
+@pytest.fixture
+def in_process(settings):
+    settings.CONFETTI = {**settings.CONFETTI, 'CHANGES_BACKEND': 'confetti.changes.InProcessBroadcast'}
+
+
+def _stream(user=None, last_event_id=None):
+    headers = {'HTTP_LAST_EVENT_ID': str(last_event_id)} if last_event_id is not None else {}
+    request = RequestFactory().get('/api/confetti/settings/stream/', **headers)
+    request.user = user or AnonymousUser()
+    return request
+
+
+def _read_events(request, count, during=None):
+    """Первые count событий потока; during — синхронное действие после подписки."""
+    async def run():
+        response = await SettingChangeStreamView.as_view()(request)
+        assert response['Content-Type'] == 'text/event-stream'
+        events = []
+        stream = aiter(response.streaming_content)
+        # первый чанк — retry, после него подписка уже оформлена
+        await anext(stream)
+        if during is not None:
+            from asgiref.sync import sync_to_async
+            await sync_to_async(during)()
+        while len(events) < count:
+            chunk = await anext(stream)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith('id:'):
+                lines = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+                events.append((int(lines['id']), json.loads(lines['data'])))
+        return events
+    return async_to_sync(run)()
+
+
+def test_signals_write_change_log(user):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    set_value('ui.theme', 'dark', user=user)
+    set_many({'front': False}, scope=SettingScope.GLOBAL)
+    SettingDefinition.objects.filter(key='edit').first().save()
+
+    changes = list(SettingChange.objects.values_list('key', 'scope', 'user_id', 'action'))
+    assert changes[-4:] == [
+        ('ui.theme', 'global', None, 'save'),
+        ('ui.theme', 'user', user.id, 'save'),
+        ('front', 'global', None, 'save'),
+        ('edit', None, None, 'save'),
+    ]
+
+
+def test_stream_resumes_from_last_event_id(fast_poll, user, django_user_model):
+    last_id = SettingChange.objects.order_by('id').values_list('id', flat=True).last() or 0
+    other = django_user_model.objects.create(username='other')
+    set_many({'ui.theme': 'dark'}, user=other)
+    set_many({'ui.theme': 'dark'}, user=user)
+    set_many({'front': False}, scope=SettingScope.GLOBAL)
+
+    events = _read_events(_stream(user, last_event_id=last_id), 2)
+    # override другого пользователя в поток не попадает
+    assert [data for _, data in events] == [
+        {'key': 'ui.theme', 'scope': 'user', 'action': 'save'},
+        {'key': 'front', 'scope': 'global', 'action': 'save'},
+    ]
+    assert events[0][0] > last_id
+
+    events = _read_events(_stream(user, last_event_id=events[0][0]), 1)
+    assert events[0][1]['key'] == 'front'
+
+
+def test_stream_hides_non_editable_settings(fast_poll, django_user_model):
+    last_id = SettingChange.objects.order_by('id').values_list('id', flat=True).last() or 0
+    set_many({'edit': True}, scope=SettingScope.GLOBAL)
+    front = SettingDefinition.objects.get(key='front')
+    front.editable = False
+    front.save()
+    set_many({'ui.theme': 'dark'}, scope=SettingScope.GLOBAL)
+
+    # скрытая всё время настройка не видна, ставшая скрытой приходит как удаление
+    events = _read_events(_stream(last_event_id=last_id), 2)
+    assert [data for _, data in events] == [
+        {'key': 'front', 'scope': None, 'action': 'delete'},
+        {'key': 'ui.theme', 'scope': 'global', 'action': 'save'},
+    ]
+
+    staff = django_user_model.objects.create(username='staff', is_staff=True)
+    events = _read_events(_stream(staff, last_event_id=last_id), 3)
+    assert [(data['key'], data['action']) for _, data in events] == [
+        ('edit', 'save'), ('front', 'save'), ('ui.theme', 'save'),
+    ]
+
+
+def test_stream_pushes_new_changes(fast_poll):
+    events = _read_events(_stream(), 1, during=lambda: set_many({'ui.theme': 'dark'}, scope=SettingScope.GLOBAL))
+    assert events[0][1] == {'key': 'ui.theme', 'scope': 'global', 'action': 'save'}
+
+
+def test_in_process_backend(in_process):
+    backend = get_broadcast()
+    assert isinstance(backend, InProcessBroadcast)
+
+    set_many({'ui.theme': 'dark'}, scope=SettingScope.GLOBAL)
+    first_id = backend._buffer[-1]['id']
+
+    events = _read_events(_stream(), 1, during=lambda: set_many({'front': False}, scope=SettingScope.GLOBAL))
+    assert events[0][1]['key'] == 'front'
+
+    events = _read_events(_stream(last_event_id=first_id - 1), 2)
+    assert [data['key'] for _, data in events] == ['ui.theme', 'front']
+
+
+def test_delta_sync_endpoint(user, django_user_model):
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    url = reverse('confetti:settings-changes')
+
+    seq = client.get(url, {'since': 0}).json()['seq']
+    other = django_user_model.objects.create(username='other')
+    set_many({'ui.theme': 'dark'}, user=other)
+    set_many({'front': False}, user=user)
+    SettingDefinition.objects.get(key='feature.jobs').delete()
+
+    body = client.get(url, {'since': seq}).json()
+    assert body['changed'] == ['front']
+    assert body['deleted'] == ['feature.jobs']
+    assert body['seq'] > seq
+
+    assert client.get(url, {'since': body['seq']}).json() == {'seq': body['seq'], 'changed': [], 'deleted': []}
+
+    # нередактируемая настройка не видна обычному пользователю ни как изменённая, ни как удалённая
+    seq = body['seq']
+    SettingDefinition.objects.filter(key='front').update(editable=False)
+    set_many({'front': True}, scope=SettingScope.GLOBAL)
+    body = client.get(url, {'since': seq}).json()
+    assert body['changed'] == [] and body['deleted'] == []
+    user.is_staff = True
+    user.save()
+    assert client.get(url, {'since': seq}).json()['changed'] == ['front']
+    assert client.get(url, {'since': 'x'}).status_code == 400
+
+
+def test_delta_sync_reports_hidden_keys_as_deleted(user):
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    url = reverse('confetti:settings-changes')
+    seq = client.get(url, {'since': 0}).json()['seq']
+
+    # настройка стала нередактируемой — клиент должен удалить её у себя
+    front = SettingDefinition.objects.get(key='front')
+    front.editable = False
+    front.save()
+    body = client.get(url, {'since': seq}).json()
+    assert body['changed'] == [] and body['deleted'] == ['front']
+
+    # удаление всегда скрытой настройки обычному пользователю не показывается
+    seq = body['seq']
+    SettingDefinition.objects.get(key='edit').delete()
+    assert client.get(url, {'since': seq}).json()['deleted'] == []
+    user.is_staff = True
+    user.save()
+    assert client.get(url, {'since': seq}).json()['deleted'] == ['edit']
+
+
+def test_delta_sync_after_prune_requires_resync(user):
+    import datetime
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from confetti.changes import prune_changes
+
+    url = reverse('confetti:settings-changes')
+    set_many({'ui.theme': 'dark'}, scope=SettingScope.GLOBAL)
+    set_many({'front': False}, scope=SettingScope.GLOBAL)
+    last = SettingChange.objects.order_by('id').last()
+
+    assert prune_changes(datetime.timedelta(seconds=-60)) > 0
+    # последняя запись остаётся
+    assert list(SettingChange.objects.values_list('id', flat=True)) == [last.id]
+
+    r = APIClient().get(url, {'since': 0})
+    assert r.status_code == 410
+    assert r.json()['resync'] is True
+    assert APIClient().get(url, {'since': last.id - 1}).json()['changed'] == ['front']
+
+
+def test_out_of_order_commit_is_not_lost(settings):
+    """Запись с меньшим id, закоммиченная после записи с большим, доходит до клиента."""
+    from confetti.changes import changes_since
+    from confetti.journal import JournalCursor
+
+    settings.CONFETTI = {**settings.CONFETTI, 'CHANGES_SETTLE_TIME': 60}
+    since = SettingChange.objects.order_by('id').last().id
+    cursor = JournalCursor(since)
+    # id since + 1 занят ещё не закоммиченной транзакцией, since + 2 уже виден
+    SettingChange.objects.create(id=since + 2, key='front', scope=SettingScope.GLOBAL, action='save')
+
+    seq, keys = changes_since(since)
+    assert keys == ['front'] and seq == since
+    assert [row['key'] for row in cursor.advance(list(cursor.pending(100)))] == ['front']
+
+    SettingChange.objects.create(id=since + 1, key='ui.theme', scope=SettingScope.GLOBAL, action='save')
+    seq, keys = changes_since(seq)
+    assert keys == ['front', 'ui.theme']
+    # уже отданная запись повторно не приходит
+    assert [row['key'] for row in cursor.advance(list(cursor.pending(100)))] == ['ui.theme']
+
+    settings.CONFETTI = {**settings.CONFETTI, 'CHANGES_SETTLE_TIME': 0}
+    assert changes_since(seq)[0] == since + 2
+    cursor.advance(list(cursor.pending(100)))
+    assert cursor.after == since + 2
@@ -0,0 +1,158 @@
+import pytest
+from django.urls import reverse
+
+from confetti.api import set_value
+from confetti.models import SettingScope
+
+drf = pytest.importorskip('rest_framework')
+from rest_framework.test import APIClient
+from rest_framework import status
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.mark.parametrize('url', [
+    reverse('confetti:settings-list'),
+    reverse('confetti:settings-frontend'),
+    reverse('confetti:settings-detail', kwargs={'key': 'ui.theme'}),
+])
+def test_unchanged_registry_returns_304_without_db(api_client, url, django_assert_num_queries):
+    r = api_client.get(url)
+    assert r.status_code == status.HTTP_200_OK
+    etag = r['ETag']
+    assert r['Last-Modified']
+
+    with django_assert_num_queries(0):
+        r = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == status.HTTP_304_NOT_MODIFIED
+
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    r = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == status.HTTP_200_OK
+    assert r['ETag'] != etag
+
+
+def test_if_modified_since(api_client):
+    url = reverse('confetti:settings-frontend')
+    r = api_client.get(url)
+    r = api_client.get(url, HTTP_IF_MODIFIED_SINCE=r['Last-Modified'])
+    assert r.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_etag_varies_by_user(api_client, user, django_user_model):
+    url = reverse('confetti:settings-list')
+    anon_etag = api_client.get(url)['ETag']
+
+    api_client.force_authenticate(user=user)
+    user_etag = api_client.get(url)['ETag']
+    assert user_etag != anon_etag
+
+    # override другого пользователя не меняет ETag
+    other = django_user_model.objects.create(username='other')
+    set_value('ui.theme', 'dark', user=other)
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=user_etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    # свой override — меняет
+    set_value('ui.theme', 'dark', user=user)
+    r = api_client.get(url, HTTP_IF_NONE_MATCH=user_etag)
+    assert r.status_code == status.HTTP_200_OK
+    assert {i['key']: i for i in r.json()}['ui.theme']['user_value'] == 'dark'
+
+
+def test_session_login_gets_own_list(client, user):
+    url = reverse('confetti:settings-list')
+    anon_etag = client.get(url)['ETag']
+    set_value('ui.theme', 'dark', user=user)
+
+    # обычная сессия (DRF-аутентификация по умолчанию), а не force_authenticate
+    client.force_login(user)
+    r = client.get(url)
+    assert r['ETag'] != anon_etag
+    assert {i['key']: i for i in r.json()}['ui.theme']['user_value'] == 'dark'
+    assert client.get(url, HTTP_IF_NONE_MATCH=r['ETag']).status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.parametrize('url', [reverse('confetti:settings-frontend'), reverse('confetti:settings-frontend-async')])
+def test_frontend_reader_during_invalidation_gets_fresh_body(api_client, monkeypatch, url):
+    from asgiref.sync import async_to_sync
+    from django.test import AsyncClient
+
+    from confetti import api
+
+    get_url = (lambda: async_to_sync(AsyncClient().get)(url)) if 'async' in url else (lambda: api_client.get(url))
+    assert get_url().json()[0]['effective'] is True
+    seen = []
+    bump = api.bump_registry_version
+
+    def bump_and_read():
+        bump()
+        # читатель между подъёмом версии и концом инвалидации
+        seen.append(get_url())
+
+    monkeypatch.setattr(api, 'bump_registry_version', bump_and_read)
+    set_value('front', False, scope=SettingScope.GLOBAL)
+    monkeypatch.undo()
+
+    in_gap = seen[0]
+    assert in_gap.json()[0]['effective'] is False
+    assert get_url()['ETag'] == in_gap['ETag']
+
+
+def test_frontend_value_change_refreshes_body(api_client):
+    url = reverse('confetti:settings-frontend')
+    assert api_client.get(url).json()[0]['effective'] is True
+    set_value('front', False, scope=SettingScope.GLOBAL)
+    assert api_client.get(url).json()[0]['effective'] is False
+
+
+def test_frontend_serves_precompressed_bytes(api_client, django_assert_num_queries):
+    import gzip
+    import json
+
+    url = reverse('confetti:settings-frontend')
+    plain = api_client.get(url)
+    assert 'Content-Encoding' not in plain
+    assert 'Accept-Encoding' in plain['Vary']
+
+    with django_assert_num_queries(0):
+        r = api_client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert r['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(r.content)) == plain.json()
+    # у каждого варианта свой ETag
+    assert r['ETag'] != plain['ETag']
+
+    r = api_client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+    assert 'Content-Encoding' not in r
+
+
+def test_authenticated_list_is_cached_per_user(api_client, user, django_user_model, django_assert_num_queries):
+    from confetti.models import SettingCategory
+
+    url = reverse('confetti:settings-list')
+    api_client.force_authenticate(user=user)
+    first = api_client.get(url).json()
+
+    with django_assert_num_queries(0):
+        assert api_client.get(url).json() == first
+
+    # чужой override — тот же ключ кэша
+    other = django_user_model.objects.create(username='other')
+    set_value('ui.theme', 'dark', user=other)
+    with django_assert_num_queries(0):
+        api_client.get(url)
+
+    set_value('ui.theme', 'dark', user=user)
+    items = {i['key']: i for i in api_client.get(url).json()}
+    assert items['ui.theme']['effective'] == 'dark'
+
+    set_value('front', False, scope=SettingScope.GLOBAL)
+    assert {i['key']: i for i in api_client.get(url).json()}['front']['global_value'] is False
+
+    SettingCategory.objects.filter(code='ui').first().save()
+    with django_assert_num_queries(1):
+        api_client.get(url)
@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+import confetti
+from confetti.api import _ck, _is_enabled_ck, get, set_value
+from confetti.handles import SettingHandle
+from confetti.models import SettingDefinition, SettingScope, SettingType
+
+pytestmark = pytest.mark.django_db
+
+
+def test_handle_keys_match_api_keys(user):
+    handle = confetti.setting('ui.theme')
+    assert isinstance(handle, SettingHandle)
+    gen = handle._generation()
+    assert handle._keys(user.id, gen) == (_ck('ui.theme', user.id), _ck('ui.theme'))
+    assert handle._enabled_key(user.id, gen) == _is_enabled_ck('ui.theme', user.id)
+
+
+def test_handle_get_and_is_enabled(user, django_assert_num_queries):
+    theme = confetti.setting('ui.theme')
+    front = confetti.setting('front')
+    set_value('ui.theme', 'dark', user=user)
+
+    assert theme.get(user) == 'dark'
+    assert theme.get() == 'light'
+    with django_assert_num_queries(0):
+        assert theme.get(user) == 'dark'
+        # кэш общий с api.get
+        assert get('ui.theme', user=user) == 'dark'
+    assert front.is_enabled(user) is True
+    assert confetti.setting('missing.key', default=5).get() == 5
+
+
+def test_handle_typed_coercion():
+    SettingDefinition.objects.create(key='jobs.started', type=SettingType.DATETIME, title='Started')
+    SettingDefinition.objects.create(key='jobs.timeout', type=SettingType.DURATION, title='Timeout')
+    set_value('jobs.started', '2024-05-01T10:00:00', scope=SettingScope.GLOBAL)
+    set_value('jobs.timeout', 90, scope=SettingScope.GLOBAL)
+
+    assert confetti.setting('jobs.started').get() == datetime.datetime(2024, 5, 1, 10, 0)
+    assert confetti.setting('jobs.timeout').get() == datetime.timedelta(seconds=90)
+    assert confetti.setting('jobs.timeout', type=str).get() == '90'
+    assert confetti.setting('jobs.missing', type=int).get(default='n/a') == 'n/a'
+
+
+def test_handle_batch_for_users(user, django_user_model, django_assert_num_queries):
+    other = django_user_model.objects.create(username='other')
+    set_value('ui.theme', 'dark', user=other)
+    set_value('front', False, user=user)
+
+    theme = confetti.setting('ui.theme', type=str)
+    with django_assert_num_queries(2):
+        assert theme.get_many([user, other.id]) == {user.id: 'light', other.id: 'dark'}
+    with django_assert_num_queries(0):
+        assert theme.get_many([user, other]) == {user.id: 'light', other.id: 'dark'}
+
+    assert confetti.setting('front').is_enabled_many([user, other]) == {user.id: False, other.id: True}
@@ -0,0 +1,88 @@
+import pytest
+from asgiref.sync import async_to_sync
+
+from confetti import invalidation
+from confetti.api import aget, get, is_enabled, local_cache, set_value
+from confetti.models import SettingChange, SettingScope, SettingValue
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def bus(settings):
+    settings.CONFETTI = {
+        **settings.CONFETTI,
+        'LOCAL_CACHE': True,
+        'INVALIDATION_BUS': 'confetti.invalidation.DatabaseInvalidationBus',
+        'INVALIDATION_POLL_INTERVAL': 0,
+    }
+    invalidation._buses.clear()
+    invalidation._throttle.reset()
+    yield
+    invalidation._buses.clear()
+    local_cache.clear()
+
+
+def _write_elsewhere(key, value, scope=SettingScope.GLOBAL, user=None):
+    """Запись «другого воркера»: строка и журнал, без сигналов и без нашего кэша."""
+    SettingValue.objects.filter(definition__key=key, scope=scope, user=user).update(value=value)
+    SettingChange.objects.create(key=key, scope=scope, user=user)
+
+
+def test_global_change_from_other_worker(bus):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert get('ui.theme') == 'dark'
+
+    _write_elsewhere('ui.theme', 'light')
+    assert get('ui.theme') == 'light'
+
+
+def test_user_change_from_other_worker(bus, user):
+    set_value('front', True, user=user)
+    assert is_enabled('front', user=user) is True
+    assert get('front', user=user) is True
+
+    _write_elsewhere('front', False, scope=SettingScope.USER, user=user)
+    assert get('front', user=user) is False
+
+
+def test_handle_read_polls_bus(bus, user):
+    import confetti
+
+    theme = confetti.setting('ui.theme')
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    set_value('ui.theme', 'dark', user=user)
+    assert theme.get() == 'dark'
+    assert theme.get(user=user) == 'dark'
+
+    _write_elsewhere('ui.theme', 'light')
+    _write_elsewhere('ui.theme', 'light', scope=SettingScope.USER, user=user)
+    assert theme.get() == 'light'
+    assert theme.get(user=user) == 'light'
+
+
+def test_async_read_polls_bus(bus):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert get('ui.theme') == 'dark'
+
+    _write_elsewhere('ui.theme', 'light')
+    assert async_to_sync(aget)('ui.theme') == 'light'
+
+
+def test_overflow_drops_everything(bus, settings):
+    settings.CONFETTI = {**settings.CONFETTI, 'INVALIDATION_BATCH_SIZE': 1}
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert get('ui.theme') == 'dark'
+
+    _write_elsewhere('ui.theme', 'light')
+    SettingChange.objects.create(key='front', scope=SettingScope.GLOBAL)
+    # два изменения при лимите в одно — сброс всех локальных уровней
+    assert get('ui.theme') == 'light'
+
+
+def test_poll_interval_bounds_checks(bus, settings, django_assert_num_queries):
+    settings.CONFETTI = {**settings.CONFETTI, 'INVALIDATION_POLL_INTERVAL': 60}
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    get('ui.theme')
+    with django_assert_num_queries(0):
+        assert get('ui.theme') == 'dark'
@@ -0,0 +1,60 @@
+import pytest
+from django.core.cache import cache
+
+from confetti.api import _ck, get, is_enabled, local_cache, set_value
+from confetti.models import SettingDefinition, SettingScope, SettingValue
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def local_cache_on(settings):
+    settings.CONFETTI = {**settings.CONFETTI, 'LOCAL_CACHE': True, 'LOCAL_CACHE_MAXSIZE': 2}
+    yield
+    local_cache.clear()
+
+
+def test_local_cache_serves_without_shared_cache(local_cache_on):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert get('ui.theme') == 'dark'
+
+    # даже если общий кэш потерял ключ, L1 отвечает сам
+    cache.delete(_ck('ui.theme'))
+    assert get('ui.theme') == 'dark'
+    assert local_cache.stats()['hits'] >= 1
+
+
+def test_local_cache_invalidated_by_signals(local_cache_on, user):
+    set_value('ui.theme', 'dark', user=user)
+    assert get('ui.theme', user=user) == 'dark'
+
+    SettingValue.objects.filter(user=user).delete()
+    SettingValue.objects.create(
+        definition=SettingDefinition.objects.get(key='ui.theme'),
+        scope=SettingScope.USER, user=user, value='light',
+    )
+    assert get('ui.theme', user=user) == 'light'
+
+
+def test_local_cache_returns_copies(local_cache_on, settings):
+    settings.CONFETTI = {**settings.CONFETTI, 'LOCAL_CACHE_MAXSIZE': 64}
+    SettingDefinition.objects.create(key='j', type='json', title='J', default={'a': [1]})
+    assert get('j') == {'a': [1]}
+    # повторное чтение — из L1; правка результата вызывающим не портит кэш
+    get('j')['a'].append(2)
+    assert get('j') == {'a': [1]}
+    assert local_cache.stats()['hits'] >= 2
+
+
+def test_local_cache_is_bounded(local_cache_on):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    get('ui.theme')
+    is_enabled('feature.jobs')
+    is_enabled('front')
+    assert local_cache.stats()['size'] == 2
+
+
+def test_local_cache_disabled_by_default():
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    get('ui.theme')
+    assert local_cache.stats()['size'] == 0
@@ -0,0 +1,159 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from confetti.api import get, is_enabled, request_settings, set_value
+from confetti.middleware import ConfettiMiddleware
+from confetti.models import SettingScope
+
+pytestmark = pytest.mark.django_db
+
+
+def _run(view, user):
+    request = RequestFactory().get('/')
+    request.user = user
+    return ConfettiMiddleware(view)(request)
+
+
+def test_request_context_reads_only_requested_keys(user, django_assert_num_queries):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    set_value('front', False, user=user)
+    seen = {}
+
+    def view(request):
+        seen['theme'] = get('ui.theme', user=request.user)
+        seen['front'] = is_enabled('front', user=request.user)
+        seen['front_global'] = is_enabled('front')
+        seen['missing'] = get('missing.key', user=request.user, default=7)
+        seen['item'] = request.confetti['ui.theme']
+        seen['contains'] = 'missing.key' in request.confetti
+        return HttpResponse()
+
+    # холодный кэш: по запросу на каждый прочитанный ключ, весь реестр не грузится;
+    # повторное обращение к 'ui.theme' берётся из памяти контекста
+    with django_assert_num_queries(6):
+        _run(view, user)
+    expected = {'theme': 'dark', 'front': False, 'front_global': True, 'missing': 7, 'item': 'dark',
+                'contains': False}
+    assert seen == expected
+    assert request_settings.get() is None
+
+    # тёплый кэш: ни одного запроса
+    with django_assert_num_queries(0):
+        _run(view, user)
+    assert seen == expected
+
+
+def test_request_context_memoizes_keys(user):
+    from django.core.cache import cache
+
+    def view(request):
+        assert get('ui.theme', user=request.user) == 'light'
+        # в пределах запроса значение берётся из памяти, а не из кэша
+        cache.clear()
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(cache, 'get_many', lambda keys: pytest.fail('cache read'))
+            assert get('ui.theme', user=request.user) == 'light'
+        return HttpResponse()
+
+    _run(view, user)
+
+
+def test_request_context_serves_without_loading(user, django_assert_num_queries):
+    def view(request):
+        # ни создание контекста, ни serves() ничего не читают
+        ctx = request_settings.get()
+        assert ctx.serves(None) and ctx.serves(user.pk)
+        return HttpResponse()
+
+    with django_assert_num_queries(0):
+        _run(view, user)
+
+
+def test_request_context_anonymous_and_other_user(user, django_user_model):
+    other = django_user_model.objects.create(username='other')
+    set_value('ui.theme', 'dark', user=other)
+
+    def view(request):
+        assert get('ui.theme') == 'light'
+        # чужой пользователь идёт обычным путём через кэш/БД
+        assert get('ui.theme', user=other) == 'dark'
+        return HttpResponse()
+
+    _run(view, AnonymousUser())
+
+
+def test_request_context_reset_after_set_value(user):
+    def view(request):
+        assert get('ui.theme', user=request.user) == 'light'
+        set_value('ui.theme', 'dark', user=request.user)
+        assert get('ui.theme', user=request.user) == 'dark'
+        return HttpResponse()
+
+    _run(view, user)
+
+
+def test_request_context_reset_after_bulk_writes(user):
+    from confetti.api import reset_for_users, set_for_users
+
+    def view(request):
+        assert get('ui.theme', user=request.user) == 'light'
+        set_for_users('ui.theme', {request.user.id: 'dark'})
+        assert get('ui.theme', user=request.user) == 'dark'
+        reset_for_users('ui.theme', [request.user.id])
+        assert get('ui.theme', user=request.user) == 'light'
+        return HttpResponse()
+
+    _run(view, user)
+
+
+def test_request_context_preload_reads_keys_in_one_batch(user, django_assert_num_queries):
+    from django.core.cache import cache
+
+    set_value('ui.theme', 'dark', user=user)
+    calls = []
+    get_many = cache.get_many
+
+    keys = ['ui.theme', 'front', 'missing.key']
+
+    def view(request):
+        # первый проход заводит счётчики поколений
+        request.confetti.preload(keys)
+        request.confetti.reset()
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(cache, 'get_many', lambda keys: calls.append(keys) or get_many(keys))
+            request.confetti.preload(keys)
+            # поколения и значения — по одному get_many на get() и на is_enabled(), сколько бы ни было ключей
+            assert len(calls) == 4
+            calls.clear()
+            with django_assert_num_queries(0):
+                assert get('ui.theme', user=request.user) == 'dark'
+                assert is_enabled('front', user=request.user)
+                assert get('missing.key', user=request.user, default=7) == 7
+            assert calls == []
+        return HttpResponse()
+
+    _run(view, user)
+
+
+def test_middleware_async_chain(user):
+    from asgiref.sync import async_to_sync, iscoroutinefunction
+
+    from confetti.api import aget
+
+    seen = {}
+
+    async def view(request):
+        seen['ctx'] = request_settings.get() is request.confetti
+        await request.confetti.apreload(['ui.theme'])
+        seen['theme'] = await aget('ui.theme', user=request.user)
+        return HttpResponse()
+
+    middleware = ConfettiMiddleware(view)
+    assert iscoroutinefunction(middleware)
+    request = RequestFactory().get('/')
+    request.user = user
+    async_to_sync(middleware)(request)
+    assert seen == {'ctx': True, 'theme': 'light'}
+    assert request_settings.get() is None
@@ -0,0 +1,56 @@
+import pytest
+from django.core.cache import cache
+
+from confetti.api import get, get_many, is_enabled, set_value
+from confetti.models import SettingDefinition, SettingScope
+from confetti.versions import REGISTRY_VERSION_KEY, registry_version
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def snapshot(settings):
+    settings.CONFETTI = {**settings.CONFETTI, 'REGISTRY_SNAPSHOT': True, 'REGISTRY_POLL_INTERVAL': 60}
+
+
+def test_global_reads_are_dict_lookups(snapshot, user, django_assert_num_queries):
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    SettingDefinition.objects.filter(key='feature.jobs').update(enabled=False)
+    assert get('ui.theme') == 'dark'
+
+    with django_assert_num_queries(0):
+        assert get('ui.theme') == 'dark'
+        assert get('missing.key', default=1) == 1
+        assert is_enabled('front') is True
+        assert is_enabled('feature.jobs', default=True) is False
+        assert get_many(['ui.theme', 'front']) == {'ui.theme': 'dark', 'front': True}
+
+    # пользовательские чтения идут обычным путём
+    set_value('ui.theme', 'light', user=user)
+    assert get('ui.theme', user=user) == 'light'
+
+
+def test_snapshot_returns_copies(snapshot):
+    SettingDefinition.objects.create(key='j', type='json', title='J', default={'a': [1]})
+    get('j')['a'].append(2)
+    assert get('j') == {'a': [1]}
+    assert get_many(['j']) == {'j': {'a': [1]}}
+
+
+def test_local_change_refreshes_snapshot(snapshot):
+    assert get('ui.theme') == 'light'
+    version = registry_version()
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert registry_version() != version
+    assert get('ui.theme') == 'dark'
+
+
+def test_foreign_change_is_polled(snapshot, settings):
+    assert get('ui.theme') == 'light'
+    # изменение «в другом процессе»: строка в БД и новая версия, без локальной инвалидации
+    SettingDefinition.objects.filter(key='ui.theme').update(default='dark')
+    cache.set(REGISTRY_VERSION_KEY, 1, None)
+    assert get('ui.theme') == 'light'
+
+    settings.CONFETTI = {**settings.CONFETTI, 'REGISTRY_POLL_INTERVAL': 0}
+    assert get('ui.theme') == 'dark'
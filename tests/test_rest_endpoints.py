@@ -57,7 +57,7 @@ def test_frontend_cache_invalidation(api_client, user):
     url = reverse('confetti:settings-frontend')
     r = api_client.get(url)
     assert r.status_code == status.HTTP_200_OK
-    data = r.data
+    data = r.json()
     assert data[0]['key'] == 'front'
     assert data[0]['frontend'] == True
     assert data[0]['default'] == True
@@ -69,7 +69,7 @@ def test_frontend_cache_invalidation(api_client, user):
 
     r = api_client.get(url)
     assert r.status_code == status.HTTP_200_OK
-    data = r.data
+    data = r.json()
     assert data[0]['key'] == 'front'
     assert data[0]['frontend'] == True
     assert data[0]['default'] == False
@@ -95,3 +95,123 @@ def test_user_not_allowed_to_edit_not_editable_settings(api_client, user):
 
     r = api_client.patch(url, {'value': True}, format='json')
     assert r.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_list_settings_constant_queries(api_client, user, django_assert_num_queries):
+    from confetti.api import set_value
+    from confetti.models import SettingScope
+
+    for i in range(20):
+        SettingDefinition.objects.create(key=f'bulk.{i}', type='int', title=f'Bulk {i}', default=i)
+        set_value(f'bulk.{i}', i + 100, scope=SettingScope.GLOBAL)
+    set_value('bulk.1', 7, user=user)
+    url = reverse('confetti:settings-list')
+
+    with django_assert_num_queries(1):
+        r = api_client.get(url)
+    assert r.status_code == status.HTTP_200_OK
+    items = {item['key']: item for item in r.json()}
+    assert items['bulk.1']['global_value'] == 101
+    assert items['bulk.1']['effective'] == 101
+    assert items['ui.theme']['effective'] == 'light'
+
+    api_client.force_authenticate(user=user)
+    with django_assert_num_queries(1):
+        r = api_client.get(url)
+    items = {item['key']: item for item in r.json()}
+    assert items['bulk.1']['user_value'] == 7
+    assert items['bulk.1']['effective'] == 7
+    assert items['bulk.2']['user_value'] is None
+
+
+def _create_definitions(prefix, count, category=None):
+    SettingDefinition.objects.bulk_create([
+        SettingDefinition(key=f'{prefix}.{i:03d}', type='int', title=f'{prefix} {i}', default=i, category=category)
+        for i in range(count)
+    ])
+
+
+def test_list_cursor_pagination(api_client):
+    _create_definitions('page', 5)
+    url = reverse('confetti:settings-list')
+
+    keys, cursor = [], None
+    while True:
+        params = {'prefix': 'page.', 'limit': 2, **({'cursor': cursor} if cursor else {})}
+        r = api_client.get(url, params)
+        assert r.status_code == status.HTTP_200_OK
+        body = r.json()
+        keys += [item['key'] for item in body['results']]
+        cursor = body['next']
+        if cursor is None:
+            break
+    assert keys == [f'page.{i:03d}' for i in range(5)]
+
+
+def test_list_filters_and_sparse_fields(api_client, django_assert_num_queries):
+    from confetti.models import SettingCategory
+    category = SettingCategory.objects.create(code='paging', title='Paging')
+    _create_definitions('cat', 3, category=category)
+    url = reverse('confetti:settings-list')
+
+    r = api_client.get(url, {'category': 'paging'})
+    assert [item['key'] for item in r.json()] == ['cat.000', 'cat.001', 'cat.002']
+
+    r = api_client.get(url, {'keys': 'cat.001,feature.jobs,nope'})
+    assert {item['key'] for item in r.json()} == {'cat.001', 'feature.jobs'}
+
+    with django_assert_num_queries(1) as ctx:
+        r = api_client.get(url, {'prefix': 'cat.', 'fields': 'key,effective'})
+    assert r.json()[0] == {'key': 'cat.000', 'effective': 0}
+    sql = ctx.captured_queries[0]['sql']
+    assert 'title' not in sql and 'confetti_settingcategory' not in sql
+
+
+def test_list_bad_params(api_client):
+    url = reverse('confetti:settings-list')
+    assert api_client.get(url, {'fields': 'key,secret'}).status_code == status.HTTP_400_BAD_REQUEST
+    assert api_client.get(url, {'limit': 0}).status_code == status.HTTP_400_BAD_REQUEST
+    assert api_client.get(url, {'cursor': '!!!'}).status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_bulk_patch(api_client, user, django_user_model):
+    url = reverse('confetti:settings-bulk')
+    payload = {'values': {'ui.theme': 'dark', 'front': 'x', 'edit': True}}
+    assert api_client.patch(url, payload, format='json').status_code == status.HTTP_401_UNAUTHORIZED
+
+    api_client.force_authenticate(user=user)
+    r = api_client.patch(url, payload, format='json')
+    assert r.status_code == status.HTTP_200_OK
+    body = r.json()
+    assert [item['key'] for item in body['results']] == ['ui.theme']
+    assert body['results'][0]['user_value'] == 'dark'
+    # нередактируемая настройка пользователю «не найдена», невалидное значение — ошибка
+    assert set(body['errors']) == {'front', 'edit'}
+
+    r = api_client.patch(url, {'scope': 'global', 'values': {'front': False}}, format='json')
+    assert r.status_code == status.HTTP_403_FORBIDDEN
+
+    staff = django_user_model.objects.create_user(username='s', password='p', is_staff=True)
+    api_client.force_authenticate(user=staff)
+    r = api_client.patch(url, {'scope': 'global', 'values': {'front': False}}, format='json')
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()['results'][0]['global_value'] is False
+    assert api_client.get(reverse('confetti:settings-frontend')).json()[0]['effective'] is False
+
+
+@pytest.mark.parametrize('encoder', ['confetti.payload.json_dumps', 'confetti.payload.orjson_dumps'])
+def test_fast_serialization_matches_drf(api_client, user, settings, encoder):
+    from confetti.api import set_value
+    set_value('ui.theme', 'dark', user=user)
+    api_client.force_authenticate(user=user)
+    urls = [
+        reverse('confetti:settings-list'),
+        reverse('confetti:settings-list') + '?fields=key,effective&limit=2',
+        reverse('confetti:settings-frontend'),
+    ]
+    expected = [api_client.get(url).json() for url in urls]
+
+    from django.core.cache import cache
+    cache.clear()
+    settings.CONFETTI = {**settings.CONFETTI, 'FAST_SERIALIZATION': True, 'JSON_ENCODER': encoder}
+    assert [api_client.get(url).json() for url in urls] == expected
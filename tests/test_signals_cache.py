@@ -2,7 +2,7 @@ import pytest
 from django.core.cache import cache
 from django.urls import reverse
 
-from confetti.api import _ck, get, set_value
+from confetti.api import _ck, get, is_enabled, set_value
 from confetti.models import SettingDefinition, SettingValue, SettingScope
 drf = pytest.importorskip('rest_framework')
 from rest_framework.test import APIClient
@@ -46,4 +46,123 @@ def test_cache_frontend(api_client):
     assert r.status_code == status.HTTP_200_OK
     cache_data =  cache.get(DEFAULTS['FRONTEND_CACHE_PREFIX'], None)
     assert cache_data is not None
-    assert cache_data == r.data
\ No newline at end of file
+    assert cache_data['identity'] == r.content
+
+def test_is_enabled_missing_flag_is_cached(django_assert_num_queries):
+    assert is_enabled('missing.flag', default=True) is True
+    with django_assert_num_queries(0):
+        assert is_enabled('missing.flag') is False
+
+    SettingDefinition.objects.create(key='missing.flag', type='bool', title='Missing', enabled=True)
+    assert is_enabled('missing.flag') is True
+
+
+def test_definition_change_bumps_generation_without_touching_overrides(user, django_user_model):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    other = django_user_model.objects.create(username='other')
+    set_value('ui.theme', 'dark', user=user)
+    set_value('ui.theme', 'dark', user=other)
+    assert get('ui.theme', user=user) == 'dark'
+    old_key = _ck('ui.theme', user.id)
+
+    defn = SettingDefinition.objects.get(key='ui.theme')
+    defn.enabled = False
+    with CaptureQueriesContext(connection) as ctx:
+        defn.save()
+    assert not any('confetti_settingvalue' in q['sql'] for q in ctx.captured_queries)
+
+    assert _ck('ui.theme', user.id) != old_key
+    assert get('ui.theme', user=user, default='off') == 'off'
+    assert get('ui.theme', user=other, default='off') == 'off'
+
+
+def test_global_value_change_invalidates_user_is_enabled(user):
+    assert is_enabled('front', user=user) is True
+    set_value('front', False, scope=SettingScope.GLOBAL)
+    assert is_enabled('front', user=user) is False
+
+
+def test_purge_definition_keys_in_chunks(user, django_user_model, settings, monkeypatch):
+    from confetti.api import _invalidate_definitions
+
+    settings.CONFETTI = {**settings.CONFETTI, 'INVALIDATION_CHUNK_SIZE': 3}
+    users = [user, *(django_user_model.objects.create(username=f'u{i}') for i in range(3))]
+    for u in users:
+        set_value('ui.theme', 'dark', user=u)
+        assert get('ui.theme', user=u) == 'dark'
+    old_keys = [_ck('ui.theme', u.id) for u in users]
+
+    calls = []
+    delete_many = cache.delete_many
+    monkeypatch.setattr(cache, 'delete_many', lambda keys: calls.append(list(keys)) or delete_many(keys))
+    cleared = _invalidate_definitions(SettingDefinition.objects.filter(key='ui.theme'), purge_keys=True)
+
+    # frontend (отдельно, до подъёма версии) + 2 глобальных + по 2 на каждого из 4 оверрайдов
+    assert cleared == 11
+    assert [len(c) for c in calls] == [3, 3, 3, 1]
+    assert not any(cache.has_key(k) for k in old_keys)
+    assert get('ui.theme', user=user) == 'dark'
+
+
+def test_invalidation_waits_for_commit():
+    from django.db import transaction
+
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert get('ui.theme') == 'dark'
+    key = _ck('ui.theme')
+
+    with transaction.atomic():
+        set_value('ui.theme', 'light', scope=SettingScope.GLOBAL)
+        # до коммита поколение прежнее: чтение из другого потока не закэширует старое значение
+        assert _ck('ui.theme') == key
+    assert _ck('ui.theme') != key
+    assert get('ui.theme') == 'light'
+
+
+def test_rollback_keeps_cache():
+    from django.db import transaction
+
+    set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+    assert get('ui.theme') == 'dark'
+    key = _ck('ui.theme')
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            set_value('ui.theme', 'light', scope=SettingScope.GLOBAL)
+            raise RuntimeError
+    assert _ck('ui.theme') == key
+    assert get('ui.theme') == 'dark'
+
+
+def test_write_through_after_commit(user, settings):
+    from confetti.api import CacheMarker
+
+    settings.CONFETTI = {**settings.CONFETTI, 'CACHE_WRITE_THROUGH': True}
+    set_value('ui.theme', 'light', scope=SettingScope.GLOBAL)
+    set_value('ui.theme', 'dark', user=user)
+    assert cache.get(_ck('ui.theme')) == 'light'
+    assert cache.get(_ck('ui.theme', user.id)) == 'dark'
+
+    SettingValue.objects.get(definition__key='ui.theme', user=user).delete()
+    assert cache.get(_ck('ui.theme', user.id)) is CacheMarker.NO_OVERRIDE
+    assert get('ui.theme', user=user) == 'light'
+
+
+def test_write_through_ignores_callback_order(user, settings, monkeypatch):
+    from django.db import transaction
+
+    settings.CONFETTI = {**settings.CONFETTI, 'CACHE_WRITE_THROUGH': True}
+    callbacks = []
+    with monkeypatch.context() as patch:
+        patch.setattr(transaction, 'on_commit', callbacks.append)
+        set_value('ui.theme', 'dark', scope=SettingScope.GLOBAL)
+        set_value('ui.theme', 'light', scope=SettingScope.GLOBAL)
+        set_value('ui.theme', 'dark', user=user)
+        SettingValue.objects.filter(user=user).delete()
+    # колбэки двух писателей выполнились не в порядке коммитов
+    for callback in reversed(callbacks):
+        callback()
+    assert get('ui.theme') == 'light'
+    assert get('ui.theme', user=user) == 'light'
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+
+from confetti import api
+from confetti.api import _ck, get
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def single_flight(settings):
+    settings.CONFETTI = {**settings.CONFETTI, 'SINGLE_FLIGHT': True, 'SINGLE_FLIGHT_TIMEOUT': 2}
+
+
+@pytest.fixture
+def slow_fetch(monkeypatch):
+    calls = []
+
+    def fetch(def_keys, uid=None):
+        calls.append(list(def_keys))
+        time.sleep(0.1)
+        return {}
+
+    monkeypatch.setattr(api, '_fetch_definitions', fetch)
+    return calls
+
+
+def test_concurrent_misses_resolve_once(single_flight, slow_fetch):
+    _ck('cold.key')  # счётчики поколений заводим заранее
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get('cold.key', default=1))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [1] * 5
+    assert len(slow_fetch) == 1
+
+
+def test_lease_waits_for_other_worker(settings, single_flight, slow_fetch):
+    settings.CONFETTI = {**settings.CONFETTI, 'SINGLE_FLIGHT_LEASE': True}
+    global_key = _ck('cold.key')
+    # «другой воркер» взял аренду и через 50 мс кладет значение
+    cache.add(f'{global_key}:lease', 1, 2)
+    threading.Timer(0.05, lambda: cache.set(global_key, 'warm')).start()
+
+    assert get('cold.key') == 'warm'
+    assert slow_fetch == []
+
+
+@pytest.mark.parametrize('ttl, expected', [(5, 5), (0.5, 1), (1.2, 2)])
+def test_lease_ttl_is_whole_seconds(settings, single_flight, slow_fetch, monkeypatch, ttl, expected):
+    # Redis/Memcached округляют дробный TTL вниз — аренда 0.5 с истекла бы сразу
+    settings.CONFETTI = {**settings.CONFETTI, 'SINGLE_FLIGHT_LEASE': True, 'SINGLE_FLIGHT_TIMEOUT': 0.5,
+                         'SINGLE_FLIGHT_LEASE_TTL': ttl}
+    global_key = _ck('cold.key')
+    adds = []
+    add = cache.add
+    monkeypatch.setattr(cache, 'add', lambda key, value, timeout=None: adds.append((key, timeout)) or add(
+        key, value, timeout))
+
+    assert get('cold.key', default=1) == 1
+    assert (f'{global_key}:lease', expected) in adds
+
+
+def test_disabled_by_default(slow_fetch):
+    assert get('cold.key', default=2) == 2
+    assert len(slow_fetch) == 1